@@ -0,0 +1,44 @@
+"""Time encode_html on large code blocks, and encode_html_many against
+encoding the same fragments one at a time.
+
+Run from the repository root:
+
+    python benchmarks/bench_encode_html.py
+"""
+from __future__ import print_function, unicode_literals
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from textile import Textile
+from textile.utils import encode_html, encode_html_many
+
+
+LINE = 'if (a < b && c > d) { s = "it\'s <b>" + e; }  // plain text here\n'
+
+CODE = LINE * 1000
+
+DOCUMENT = 'bc.. {0}\np. The end.'.format(CODE)
+
+FRAGMENTS = LINE.split() * 1000
+
+
+def bench(label, stmt, number=20):
+    best = min(timeit.repeat(stmt, number=number, repeat=5))
+    print('{0:<12} {1:8.1f} usec'.format(label, best / number * 1e6))
+
+
+def main():
+    print('{0} byte code block, {1} fragments'.format(len(CODE),
+        len(FRAGMENTS)))
+    bench('encode', lambda: encode_html(CODE))
+    bench('encode many', lambda: encode_html_many(FRAGMENTS))
+    bench('encode each', lambda: [encode_html(f) for f in FRAGMENTS])
+    bench('parse', lambda: Textile().parse(DOCUMENT), number=5)
+
+
+if __name__ == '__main__':
+    main()
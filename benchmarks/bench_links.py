@@ -0,0 +1,50 @@
+"""Time rendering a link-dense page, and the url handling of each link.
+
+Run from the repository root:
+
+    python benchmarks/bench_links.py
+"""
+from __future__ import print_function, unicode_literals
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from textile import Textile
+from textile.utils import trim_url
+
+
+LINKS = [
+    '"Home":http://example.com/',
+    '"a search (with a title)":https://example.com/search?q=textile&page=2.',
+    '["bracketed":http://example.com/page]',
+    '"parenthesised":http://example.com/wiki/Foo_(bar)),',
+    '"array":http://example.com/?q[]=a&q[]=b',
+    '"unicode":http://example.com/ümlaut/pfad;',
+    '"$":http://example.com/self',
+    '"relative":/about/team#people',
+]
+
+PAGE = '\n\n'.join(' and '.join(LINKS) for _ in range(200))
+
+
+def bench(label, stmt, number, per=1, unit='link'):
+    best = min(timeit.repeat(stmt, number=number, repeat=5))
+    print('{0:<12} {1:8.1f} usec/{2}'.format(label,
+        best / number / per * 1e6, unit))
+
+
+def main():
+    t = Textile()
+    urls = [link.split('":', 1)[1] for link in LINKS]
+    bench('trim_url', lambda: [trim_url(url) for url in urls], 500,
+          len(urls))
+    bench('encode_url', lambda: [t.encode_url(url) for url in urls], 500,
+          len(urls))
+    bench('parse', lambda: Textile().parse(PAGE), 3, PAGE.count('":'))
+
+
+if __name__ == '__main__':
+    main()
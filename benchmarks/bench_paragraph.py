@@ -0,0 +1,40 @@
+"""Time the per-paragraph cost of the block, span and glyph stages.
+
+Run from the repository root:
+
+    python benchmarks/bench_paragraph.py
+"""
+from __future__ import print_function, unicode_literals
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from textile import Textile
+
+
+PARAGRAPH = ('p(intro). Here\'s a *strong* claim with _emphasis_, a '
+             '-deleted- word, some %(note)spanned% text and "a link":'
+             'http://example.com/page -- plus the usual glyphs... '
+             'NASA said "it\'s fine" in \'88 (TM).')
+
+
+def bench(label, stmt, number=500):
+    best = min(timeit.repeat(stmt, number=number, repeat=5))
+    print('{0:<12} {1:8.1f} usec/paragraph'.format(label,
+        best / number * 1e6))
+
+
+def main():
+    t = Textile()
+    text = PARAGRAPH[len('p(intro). '):]
+    bench('parse', lambda: Textile().parse(PARAGRAPH))
+    bench('block', lambda: t.block(PARAGRAPH))
+    bench('span', lambda: t.span(text))
+    bench('glyphs', lambda: t.glyphs(text))
+
+
+if __name__ == '__main__':
+    main()
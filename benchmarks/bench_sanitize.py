@@ -0,0 +1,49 @@
+"""Time sanitizing Textile's output with the built in sanitizer and with
+html5lib's, along with parsing the text in the first place.
+
+Run from the repository root:
+
+    python benchmarks/bench_sanitize.py
+"""
+from __future__ import print_function, unicode_literals
+
+import io
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from textile import Textile
+from textile.tools.sanitizer import sanitize
+
+
+def bench(label, stmt, number):
+    best = min(timeit.repeat(stmt, number=number, repeat=5))
+    print('{0:<16} {1:8.2f} msec'.format(label, best / number * 1e3))
+
+
+def main():
+    with io.open('README.textile', encoding='utf-8') as f:
+        readme = f.read()
+    comment = ('A *comment* with "a link":http://example.com/?a=1&b=2, '
+               '<span style="color: red;" onclick="evil()">some html</span>'
+               ' and <script>alert(1)</script>.\n\n'
+               'p(note){padding-left:1em}. And @code@ too.')
+    for label, text in [('README', readme), ('comment', comment)]:
+        print(label)
+        html = Textile().parse(text)
+        bench('  parse', lambda: Textile().parse(text), 20)
+        bench('  builtin', lambda: sanitize(html), 50)
+        try:
+            import html5lib
+        except ImportError:
+            print('  html5lib is not installed')
+        else:
+            import warnings
+            warnings.simplefilter('ignore', DeprecationWarning)
+            bench('  html5lib', lambda: sanitize(html, html5lib=True), 5)
+
+
+if __name__ == '__main__':
+    main()
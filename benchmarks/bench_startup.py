@@ -0,0 +1,44 @@
+"""Time how long a fresh interpreter takes to import textile, and to render
+its first document.
+
+Run from the repository root:
+
+    python benchmarks/bench_startup.py [--no-regex]
+
+--no-regex hides the regex module from textile, to measure the fallback used
+when it isn't installed.
+"""
+from __future__ import print_function, unicode_literals
+
+import os
+import subprocess
+import sys
+import timeit
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+NO_REGEX = "import sys; sys.modules['regex'] = None; "
+
+STATEMENTS = [
+    ('python', 'pass'),
+    ('import', 'import textile'),
+    ('first parse', "import textile; textile.textile('A *NASA* test.')"),
+]
+
+
+def bench(label, code, number=10):
+    command = [sys.executable, '-c', code]
+    best = min(timeit.repeat(lambda: subprocess.check_call(command, cwd=ROOT),
+        number=1, repeat=number))
+    print('{0:<12} {1:8.1f} msec'.format(label, best * 1e3))
+
+
+def main():
+    prefix = NO_REGEX if '--no-regex' in sys.argv[1:] else ''
+    for label, code in STATEMENTS:
+        bench(label, prefix + code)
+
+
+if __name__ == '__main__':
+    main()
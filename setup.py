@@ -52,12 +52,15 @@ setup(
     ],
     keywords='textile,text,html markup',
     install_requires=[
-        'html5lib>=1.0.1',
         'regex>1.0; implementation_name != "pypy"',
         ],
     extras_require={
         'develop': ['pytest', 'pytest-cov'],
-        'imagesize': ['Pillow>=3.0.0'],
+        # only used with sanitize='html5lib'
+        'html5lib': ['html5lib>=1.0.1'],
+        # image sizes are found without Pillow now.  The extra is kept so
+        # installs which ask for it still work.
+        'imagesize': [],
     },
     entry_points={'console_scripts': ['pytextile=textile.__main__:main']},
     setup_requires=['pytest-runner'],
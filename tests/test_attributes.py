@@ -1,4 +1,5 @@
-from textile.utils import parse_attributes
+from textile.utils import (parse_attributes, pba, split_attributes,
+        split_attributes_stepwise)
 import re
 
 def test_parse_attributes():
@@ -13,3 +14,29 @@ def test_parse_attributes():
     assert parse_attributes('<') == {'style': 'text-align:left;'}
     assert parse_attributes('(c#i)') == {'class': 'c', 'id': 'i'}
     assert parse_attributes('\\2 100', element='col') == {'span': '2', 'width': '100'}
+
+def test_parse_attributes_cached():
+    atts = parse_attributes('(c#i)')
+    atts['class'] = 'changed'
+    del atts['id']
+    assert parse_attributes('(c#i)') == {'class': 'c', 'id': 'i'}
+    assert parse_attributes('(c#i)', include_id=False) == {'class': 'c'}
+    assert parse_attributes('{color: blue}', restricted=True) == {}
+    assert pba('(c#i)[en]') == ' class="c" id="i" lang="en"'
+    assert pba('(c#i)', include_id=False) == ' class="c"'
+    assert pba('') == ''
+
+def test_split_attributes():
+    for atts in ['(c#i)[en]{color:red}', '((c))', '(()', ')(', '([en])',
+                 '<>', '<(c)>', '(((', '= {a:b;} (c)', '\\2 100']:
+        assert split_attributes(atts) == split_attributes_stepwise(atts)
+    assert split_attributes('(c#i)[en]', restricted=True) == \
+        split_attributes_stepwise('(c#i)[en]', restricted=True)
+    # parts which are only there once another one has been taken out are
+    # left to split_attributes_stepwise
+    for atts in ['(a[en]b)', '(a{x}b)', '(x(', '((c)(', '(a)(b)', '{a}{b}',
+                 '[a{b}c]', '{', ']']:
+        assert split_attributes(atts) is None
+    assert split_attributes_stepwise('(a[en]b)')[1:3] == ('en', 'ab')
+    assert split_attributes('({x})', restricted=True) is None
+    assert split_attributes_stepwise('({x})', restricted=True)[2] == '{x}'
@@ -21,9 +21,9 @@ def test_block():
     assert result == expect
 
     b = Block(t, "bq", "", None, "http://google.com", "Hello BlockQuote")
-    citation = '{0}1:url'.format(t.uid)
+    citation = '{0}1:u'.format(t.uid)
     expect = ('blockquote', OrderedDict([('cite',
-        '{0.uid}{0.refIndex}:url'.format(t))]), 'p', OrderedDict(),
+        '{0.uid}{0.refIndex}:u'.format(t))]), 'p', OrderedDict(),
         'Hello BlockQuote')
     result = (b.outer_tag, b.outer_atts, b.inner_tag, b.inner_atts, b.content)
     assert result == expect
@@ -0,0 +1,161 @@
+import os
+import sys
+
+import pytest
+
+from textile.cache import DiskCache, LRUCache, RenderCache, cache_key
+from textile.textilefactory import TextileFactory
+
+
+def test_cache_key():
+    options = {'html_type': 'xhtml', 'noimage': False}
+    key = cache_key('some *text*', options)
+    assert key == cache_key('some *text*', dict(options))
+    assert key != cache_key('some *text* ', options)
+    assert key != cache_key('some *text*', dict(options, noimage=True))
+
+
+def test_LRUCache():
+    cache = LRUCache(maxsize=2)
+    cache.set('a', 'A')
+    cache.set('b', 'B')
+    assert cache.get('a') == 'A'
+    cache.set('c', 'C')
+    # b was used least recently
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == ('A', None, 'C')
+    assert len(cache) == 2
+    cache.clear()
+    assert (len(cache), cache.nbytes) == (0, 0)
+
+    with pytest.raises(ValueError):
+        LRUCache(maxsize=0)
+
+
+def test_LRUCache_threads():
+    import threading
+
+    cache = LRUCache()
+    cache.set('a', 'A')
+    def fetch(i):
+        for _ in range(2000):
+            cache.fetch('a', lambda: 'A')
+            cache.fetch('b{0}'.format(i), lambda: 'B')
+    threads = [threading.Thread(target=fetch, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert (cache.hits, cache.misses) == (8 * 2000 * 2 - 8, 8)
+
+
+def test_LRUCache_maxbytes():
+    html = 'x' * 100
+    cache = LRUCache(maxbytes=2 * sys.getsizeof(html))
+    cache.set('a', html)
+    cache.set('b', html)
+    cache.set('c', html)
+    assert (cache.get('a'), len(cache)) == (None, 2)
+    assert cache.nbytes == 2 * sys.getsizeof(html)
+    # too large to be cached at all
+    cache.set('d', html * 3)
+    assert (cache.get('d'), len(cache)) == (None, 2)
+
+
+def test_TextileFactory_cache():
+    cache = LRUCache()
+    f = TextileFactory(cache=cache)
+    expect = '\t<p>some <strong>text</strong></p>'
+    assert f.process('some *text*') == expect
+    assert f.process('some *text*') == expect
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # other settings are cached separately
+    f = TextileFactory(restricted=True, cache=cache)
+    assert f.process('some *text*') == expect
+    assert (cache.hits, cache.misses) == (1, 2)
+    result = list(f.process_many(['some *text*', 'some *text*', 'more']))
+    assert result == [expect, expect, '\t<p>more</p>']
+    assert (cache.hits, cache.misses) == (3, 3)
+
+
+def test_RenderCache_backend():
+    class DictCache(RenderCache):
+        def __init__(self):
+            super(DictCache, self).__init__()
+            self.items = {}
+
+        def get(self, key):
+            return self.items.get(key)
+
+        def set(self, key, html):
+            self.items[key] = html
+
+        def clear(self):
+            self.items.clear()
+
+    cache = DictCache()
+    f = TextileFactory(cache=cache)
+    f.process('hello')
+    assert list(cache.items.values()) == ['\t<p>hello</p>']
+    assert f.process('hello') == '\t<p>hello</p>'
+    assert cache.hits == 1
+    assert cache.lookup('missing') is None
+    assert cache.lookup(f.cache_key('hello')) == '\t<p>hello</p>'
+    assert (cache.hits, cache.misses) == (2, 2)
+
+    # a backend has to implement all of them
+    class Incomplete(RenderCache):
+        def get(self, key):
+            return None
+
+    for cls in [RenderCache, Incomplete]:
+        with pytest.raises(TypeError):
+            cls()
+
+
+def test_DiskCache(tmp_path):
+    cache = DiskCache(str(tmp_path / 'cache'))
+    key = cache_key('hello', {})
+    assert cache.get(key) is None
+    cache.set(key, '\t<p>h\u00e9llo</p>\r\n')
+    assert cache.get(key) == '\t<p>h\u00e9llo</p>\r\n'
+    # no temporary files are left behind
+    assert os.listdir(os.path.dirname(cache.path(key))) == [key[2:]]
+
+    f = TextileFactory(cache=DiskCache(str(tmp_path / 'cache')))
+    assert f.process('hello') == f.process('hello') == '\t<p>hello</p>'
+    assert (f.cache.hits, f.cache.misses) == (1, 1)
+
+    cache.clear()
+    assert cache.get(key) is None
+
+
+def test_DiskCache_prune(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    for i, key in enumerate(['aaaa', 'bbbb', 'cccc']):
+        cache.set(key, 'x' * 100)
+        os.utime(cache.path(key), (i, i))
+    # using an entry makes it the most recently used
+    assert cache.get('aaaa') == 'x' * 100
+    assert cache.prune(250) == 1
+    assert cache.get('bbbb') is None
+    assert cache.get('cccc') == cache.get('aaaa') == 'x' * 100
+    assert cache.prune(0) == 2
+
+
+def test_DiskCache_other_files(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    cache.set('aaaa', 'x' * 100)
+    # files which aren't the cache's own, and another writer's temporary file
+    others = [tmp_path / 'notes.txt', tmp_path / 'aa' / 'notes.txt',
+              tmp_path / 'aa' / '.tmpabc123', tmp_path / 'docs' / 'ab12',
+              tmp_path / 'aa' / 'sub' / 'cd34']
+    for other in others:
+        other.parent.mkdir(parents=True, exist_ok=True)
+        other.write_text('mine')
+    assert cache.prune(0) == 1
+    assert cache.get('aaaa') is None
+    cache.set('bbbb', 'x')
+    cache.clear()
+    assert cache.get('bbbb') is None
+    assert all(other.read_text() == 'mine' for other in others)
@@ -1,5 +1,7 @@
+import os
 import subprocess
 import sys
+import threading
 
 import textile
 
@@ -28,3 +30,129 @@ def test_version_string():
     if type(result) == bytes:
         result = result.decode('utf-8')
     assert result.strip() == textile.__version__
+
+def test_cache_dir(tmp_path):
+    cache = str(tmp_path / 'cache')
+    command = [sys.executable, '-m', 'textile', '--cache-dir', cache,
+               'README.textile']
+    with open('tests/fixtures/README.txt') as f:
+        expect = f.read()
+    for _ in range(2):
+        result = subprocess.check_output(command).decode('utf-8')
+        assert result == expect
+    [(root, dirs, files)] = [w for w in os.walk(cache) if w[2]]
+    assert len(files) == 1
+    # unchanged input is served from the cache
+    with open(os.path.join(root, files[0]), 'w') as f:
+        f.write('cached')
+    assert subprocess.check_output(command) == b'cached'
+
+    command = [sys.executable, '-m', 'textile', '--cache-dir', cache,
+               '--prune-cache', '0K']
+    subprocess.check_call(command)
+    assert not any(files for root, dirs, files in os.walk(cache))
+
+    command = [sys.executable, '-m', 'textile', '--prune-cache', '10M']
+    assert subprocess.call(command, stderr=subprocess.DEVNULL) == 2
+
+def test_output_dir(tmp_path):
+    docs = tmp_path / 'docs'
+    (docs / 'sub').mkdir(parents=True)
+    with open('README.textile') as f:
+        (docs / 'readme.textile').write_text(f.read())
+    (docs / 'sub' / 'b.textile').write_text('*b*')
+    (docs / 'sub' / 'c.txt').write_text('_c_')
+    out = tmp_path / 'out'
+    command = [sys.executable, '-m', 'textile', '-o', str(out), '-j', '2',
+               str(docs)]
+    result = subprocess.run(command, stderr=subprocess.PIPE, check=True)
+    assert b'Converted 2 files' in result.stderr
+    assert b'files/s' in result.stderr
+    assert sorted(os.listdir(str(out))) == ['readme.html', 'sub']
+    with open('tests/fixtures/README.txt') as f:
+        assert (out / 'readme.html').read_text() == f.read()
+    assert os.listdir(str(out / 'sub')) == ['b.html']
+    assert (out / 'sub' / 'b.html').read_text() == (
+        '\t<p><strong>b</strong></p>')
+
+    # other file types, with a glob pattern in the path or given by --glob
+    out = tmp_path / 'out2'
+    pattern = os.path.join(str(docs), '**', '*.txt')
+    command = [sys.executable, '-m', 'textile', '-o', str(out), '-j', '1',
+               pattern]
+    subprocess.run(command, stderr=subprocess.PIPE, check=True)
+    assert (out / 'sub' / 'c.html').read_text() == '\t<p><em>c</em></p>'
+    command = [sys.executable, '-m', 'textile', '-o', str(out), '--glob',
+               '*.txt', '--glob', 'b.*', str(docs / 'sub')]
+    subprocess.run(command, stderr=subprocess.PIPE, check=True)
+    assert sorted(os.listdir(str(out))) == ['b.html', 'c.html', 'sub']
+
+def test_output_dir_collisions(tmp_path):
+    docs = tmp_path / 'docs'
+    (docs / 'sub').mkdir(parents=True)
+    (docs / 'a.textile').write_text('*a*')
+    (docs / 'a.txt').write_text('_a_')
+    (docs / 'sub' / 'a.textile').write_text('@a@')
+    out = tmp_path / 'out'
+    # two files which would both be written to a.html are refused, before
+    # anything is converted
+    for paths in [['--glob', '*.textile', '--glob', '*.txt', str(docs)],
+                  [str(docs / 'a.textile'), str(docs / 'sub' / 'a.textile')]]:
+        command = [sys.executable, '-m', 'textile', '-o', str(out)] + paths
+        result = subprocess.run(command, stderr=subprocess.PIPE)
+        assert result.returncode == 2
+        assert b'would both be converted to a.html' in result.stderr
+        assert not out.exists()
+    # while the same file found twice is only converted once
+    command = [sys.executable, '-m', 'textile', '-o', str(out), '-j', '1',
+               str(docs / 'a.textile'), str(docs)]
+    result = subprocess.run(command, stderr=subprocess.PIPE, check=True)
+    assert b'Converted 2 files' in result.stderr
+    assert (out / 'a.html').read_text() == '\t<p><strong>a</strong></p>'
+
+def test_convert_files_cache(tmp_path):
+    from textile.__main__ import convert_files
+    from textile.cache import LRUCache
+
+    for name in 'abc':
+        (tmp_path / '{0}.textile'.format(name)).write_text('*b*')
+    files = [(str(tmp_path / '{0}.textile'.format(name)),
+              '{0}.html'.format(name)) for name in 'abc']
+    cache = LRUCache()
+    out = tmp_path / 'out'
+    for _ in range(2):
+        assert convert_files(files, str(out), jobs=1, cache=cache) == (3, 9)
+    # the cache counts the lookups, and holds the one document they share
+    assert (cache.hits, cache.misses, len(cache)) == (5, 1, 1)
+    assert (out / 'c.html').read_text() == '\t<p><strong>b</strong></p>'
+
+def test_stream():
+    command = [sys.executable, '-m', 'textile', '--stream', 'README.textile']
+    with open('tests/fixtures/README.txt') as f:
+        expect = f.read()
+    assert subprocess.check_output(command).decode('utf-8') == expect
+
+    # the output of a block is written as soon as the first line of the next
+    # one has been read
+    command = [sys.executable, '-m', 'textile', '--stream']
+    process = subprocess.Popen(command, stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE)
+    expect = b'\t<h1>Title</h1>'
+    result = []
+    reader = threading.Thread(target=lambda: result.append(
+        process.stdout.read(len(expect))))
+    reader.start()
+    process.stdin.write(b'h1. Title\n\nA *paragraph*\n')
+    process.stdin.flush()
+    reader.join(30)
+    process.stdin.close()
+    try:
+        assert result == [expect]
+        rest = process.stdout.read()
+        assert rest == b'\n\n\t<p>A <strong>paragraph</strong></p>'
+    finally:
+        process.stdout.close()
+        process.wait()
+
+    command = [sys.executable, '-m', 'textile', '--stream', '-o', 'out']
+    assert subprocess.call(command, stderr=subprocess.DEVNULL) == 2
@@ -1,9 +1,63 @@
-from textile.tools.imagesize import getimagesize
-import pytest
+import io
 
-PIL = pytest.importorskip('PIL')
+import textile
+from textile.tools.imagesize import (getimagesize, shared_size_cache,
+        sniffimagesize)
 
-def test_imagesize():
-    assert getimagesize("http://www.google.com/intl/en_ALL/images/logo.gif") == (276, 110)
-    assert getimagesize("http://bad.domain/") == ''
-    assert getimagesize("http://www.google.com/robots.txt") is None
+from test_imagesize import jpeg, png
+
+def test_imagesize(tmp_path):
+    gif = tmp_path / 'logo.gif'
+    gif.write_bytes(b'GIF89a\x14\x01\x6e\x00' + b'\0' * 100)
+    assert getimagesize(str(gif), allow_local=True) == (276, 110)
+    assert getimagesize(gif.as_uri(), allow_local=True) == (276, 110)
+    assert getimagesize(str(tmp_path / 'missing.gif'), allow_local=True) == ''
+    robots = tmp_path / 'robots.txt'
+    robots.write_text('User-agent: *\nDisallow:\n')
+    assert getimagesize(str(robots), allow_local=True) == ''
+    assert getimagesize('ftp://example.com/logo.gif') == ''
+    # local files are only read when that's asked for
+    assert getimagesize(str(gif)) == ''
+    assert getimagesize(gif.as_uri()) == ''
+
+def test_imagesize_local_files_in_text(tmp_path, monkeypatch):
+    # images in the text can't be used to find out about local files, even
+    # with a one letter scheme, which isn't taken as a relative url
+    (tmp_path / 'c:logo.gif').write_bytes(b'GIF89a\x14\x01\x6e\x00')
+    monkeypatch.chdir(str(tmp_path))
+    shared_size_cache().clear()
+    url = (tmp_path / 'c:logo.gif').as_uri()
+    html = textile.Textile(get_sizes=True).parse('!c:logo.gif! !{0}!'.format(
+        url))
+    assert 'width' not in html and 'height' not in html
+    assert 'src="c:logo.gif"' in html
+
+def test_sniffimagesize():
+    assert sniffimagesize(io.BytesIO(png(20, 10))) == (20, 10)
+    assert sniffimagesize(io.BytesIO(jpeg(600, 300))) == (600, 300)
+    # a jpeg's frame can be after a long exif segment
+    assert sniffimagesize(io.BytesIO(jpeg(600, 300, exif=40000))) == (600,
+            300)
+    webp = b'RIFF\0\0\0\0WEBP'
+    assert sniffimagesize(io.BytesIO(webp + b'VP8 \0\0\0\0' +
+        b'\0\0\0\x9d\x01\x2a\x90\x01\x2c\x01')) == (400, 300)
+    assert sniffimagesize(io.BytesIO(webp + b'VP8L\0\0\0\0' +
+        b'\x2f' + (399 | 299 << 14).to_bytes(4, 'little'))) == (400, 300)
+    assert sniffimagesize(io.BytesIO(webp + b'VP8X\0\0\0\0' + b'\0' * 4 +
+        (399).to_bytes(3, 'little') + (299).to_bytes(3, 'little'))) == (400,
+            300)
+    svg = ('<?xml version="1.0"?>\n<!-- {0} -->\n'
+           '<svg xmlns="http://www.w3.org/2000/svg" {1}>').format('x' * 5000,
+                   '{0}')
+    for atts, size in [('width="100px" height="50"', (100, 50)),
+                       ('viewBox="0 0 300 150"', (300, 150)),
+                       ('viewBox="0,0,300,150" width="600"', (600, 300)),
+                       ('width="100%" height="50"', ''),
+                       ('', '')]:
+        f = io.BytesIO(svg.format(atts).encode('utf-8'))
+        assert sniffimagesize(f) == size
+    # truncated, or not an image at all
+    assert sniffimagesize(io.BytesIO(png(20, 10)[:20])) == ''
+    assert sniffimagesize(io.BytesIO(b'\xff\xd8\xff\xda')) == ''
+    assert sniffimagesize(io.BytesIO(b'')) == ''
+    assert sniffimagesize(io.BytesIO(b'BM')) == ''
@@ -26,3 +26,20 @@ def test_glyphs():
     result = t.glyphs("<p><cite>Cat's Cradle</cite> by Vonnegut</p>")
     expect = '<p><cite>Cat&#8217;s Cradle</cite> by Vonnegut</p>'
     assert result == expect
+
+def test_glyph_patterns_are_shared():
+    first, second = Textile(), Textile(html_type='html5')
+    assert all(a is b for a, b in zip(first.glyph_search, second.glyph_search))
+    assert first.glyph_replace[21] != second.glyph_replace[21]
+    assert first.uid in first.glyph_replace[22]
+    assert second.uid in second.glyph_replace[22]
+
+def test_glyphs_introduced_by_replacements():
+    class TextileDashes(Textile):
+        glyph_definitions = dict(Textile.glyph_definitions,
+            ellipsis=' - ')
+
+    # the ellipsis replacement introduces an en dash for the later regexes
+    result = TextileDashes().glyphs('wait...')
+    expect = 'wait &#8211; '
+    assert result == expect
@@ -1,13 +1,190 @@
+import struct
+import threading
+import time
+import zlib
+
+import pytest
+
 import textile
+from textile.tools.imagesize import (SizeCache, getimagesize,
+        getimagesizes)
+
+def test_size_cache(monkeypatch):
+    cache = SizeCache(maxsize=2, ttl=60)
+    cache.set('a', (1, 2))
+    cache.set('b', '')
+    assert cache.get('b', None) == ''
+    assert cache.get('a') == (1, 2)
+    # the least recently used is dropped
+    cache.set('c', (3, 4))
+    assert len(cache) == 2
+    assert cache.get('b') is None
+    assert cache.get('a') == (1, 2)
+    # and entries expire
+    now = time.monotonic()
+    monkeypatch.setattr(time, 'monotonic', lambda: now + 61)
+    assert cache.get('a') is None
+    assert len(cache) == 1
+    cache.clear()
+    assert len(cache) == 0
+    with pytest.raises(ValueError):
+        SizeCache(maxsize=0)
+
+def test_getimagesizes():
+    calls = []
+    running = []
+    lock = threading.Lock()
+
+    def fetch(url, timeout):
+        with lock:
+            calls.append((url, timeout))
+            running.append(url)
+            at_once = len(running)
+        time.sleep(0.05)
+        with lock:
+            running.remove(url)
+        return (at_once, len(url))
+
+    urls = ['http://example.com/{0}.png'.format(i) for i in range(6)]
+    cache = SizeCache()
+    sizes = getimagesizes(urls + urls[:2], timeout=3, workers=3, cache=cache,
+            fetch=fetch)
+    assert sorted(sizes) == sorted(urls)
+    assert sorted(calls) == [(url, 3) for url in sorted(urls)]
+    # they were fetched three at a time
+    assert max(size[0] for size in sizes.values()) == 3
+    # the second time round, they're all in the cache
+    assert getimagesizes(urls, cache=cache, fetch=fetch) == sizes
+    assert len(calls) == 6
+    assert getimagesizes([]) == {}
+
+
+PNG_SIZE = (20, 10)
+
+def png(width, height):
+    def chunk(kind, data):
+        return (struct.pack('>I', len(data)) + kind + data +
+                struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+    rows = b''.join(b'\0' + b'\0\0\0' * width for _ in range(height))
+    return (b'\x89PNG\r\n\x1a\n' +
+            chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0,
+                0)) +
+            chunk(b'IDAT', zlib.compress(rows)) + chunk(b'IEND', b''))
 
-def test_imagesize():
-    imgurl = 'http://www.google.com/intl/en_ALL/images/srpr/logo1w.png'
-    result = textile.tools.imagesize.getimagesize(imgurl)
+def jpeg(width, height, exif=0, data=0):
+    """The markers of a jpeg, with an exif segment of that many bytes, and
+    that many bytes of (not really) image data."""
+    segment = lambda marker, body: (b'\xff' + marker +
+            struct.pack('>H', len(body) + 2) + body)
+    return (b'\xff\xd8' + segment(b'\xe0', b'JFIF\0\1\1\0\0\1\0\1\0\0') +
+            (segment(b'\xe1', b'Exif\0\0' + b'x' * exif) if exif else b'') +
+            segment(b'\xdb', b'\0' * 65) +
+            segment(b'\xc0', struct.pack('>BHHB', 8, height, width, 3) +
+                b'\0' * 9) +
+            segment(b'\xda', b'\0' * 10) + b'\0' * data + b'\xff\xd9')
+
+@pytest.fixture
+def image_server():
+    """A local http server serving the images put in its dict by path,
+    taking a moment over each one.  It honours range requests except for
+    paths starting /norange/, and logs the path and the bytes sent of
+    each request."""
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+
+    class Server(ThreadingMixIn, HTTPServer):
+        daemon_threads = True
+
+    images = {}
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            time.sleep(0.2)
+            body = images.get(self.path.replace('/norange/', '/'))
+            if body is None:
+                requests.append((self.path, 0))
+                self.send_error(404)
+                return
+            start, end = 0, len(body) - 1
+            ranged = (self.headers.get('Range', '').startswith('bytes=') and
+                      not self.path.startswith('/norange/'))
+            if ranged:
+                start, _, end = self.headers['Range'][6:].partition('-')
+                start, end = int(start), min(int(end), len(body) - 1)
+                if start >= len(body):
+                    requests.append((self.path, 0))
+                    self.send_error(416)
+                    return
+                self.send_response(206)
+                self.send_header('Content-Range', 'bytes {0}-{1}/{2}'.format(
+                    start, end, len(body)))
+            else:
+                self.send_response(200)
+            self.send_header('Content-Type', 'image/png')
+            self.send_header('Content-Length', str(end + 1 - start))
+            self.end_headers()
+            sent = 0
+            try:
+                for i in range(start, end + 1, 4096):
+                    self.wfile.write(body[i:min(i + 4096, end + 1)])
+                    sent += min(4096, end + 1 - i)
+            except OSError:
+                pass
+            requests.append((self.path, sent))
+
+        def log_message(self, *args):
+            pass
+
+    server = Server(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
     try:
-        import PIL
+        yield ('http://127.0.0.1:{0}'.format(server.server_address[1]),
+               images, requests)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_getimagesize_http(image_server):
+    base, images, requests = image_server
+    images['/big.jpg'] = jpeg(600, 300, exif=30000, data=1000000)
+    images['/small.gif'] = b'GIF89a\x14\x01\x6e\x00'
+    assert getimagesize(base + '/big.jpg', timeout=5) == (600, 300)
+    # only the header was sent, skipping the exif segment
+    assert sum(sent for path, sent in requests) < 10000
+    del requests[:]
+    # a whole image shorter than the range asked for
+    assert getimagesize(base + '/small.gif') == (276, 110)
+    # the server may ignore the range, and send the whole image
+    assert getimagesize(base + '/norange/big.jpg') == (600, 300)
+    assert getimagesize(base + '/missing.png') == ''
 
-        expect = (275, 95)
-        assert result == expect
-    except ImportError:
-        expect = ''
-        assert result == expect
+def test_get_sizes_at_once(image_server):
+    base, images, requests = image_server
+    for i in range(8):
+        images['/{0}.png'.format(i)] = png(*PNG_SIZE)
+    textile.tools.imagesize.shared_size_cache().clear()
+    text = '\n\n'.join('!{0}/{1}.png!'.format(base, i) for i in range(7))
+    # one as the text of a link, and some which aren't rendered as images at
+    # all, so aren't fetched
+    text += ('\n\n"!{0}/7.png!":http://example.com/\n\n'
+             'bc. !{0}/code.png!\n\nnotextile. !{0}/notextile.png!\n\n'
+             'Some @!{0}/at.png!@ and <code>!{0}/tag.png!</code>'
+             ).format(base)
+    start = time.time()
+    html = textile.Textile(get_sizes=True).parse(text)
+    elapsed = time.time() - start
+    assert sorted(path for path, sent in requests) == [
+        '/{0}.png'.format(i) for i in range(8)]
+    assert html.count('height="{1}" src="{0}/'.format(base,
+        PNG_SIZE[1])) == 8
+    assert html.count('width="{0}"'.format(PNG_SIZE[0])) == 8
+    # fetched at once, not one after the other
+    assert elapsed < 8 * 0.2
+    # and the sizes are kept for the next parse
+    assert textile.Textile(get_sizes=True).parse(text) == html
+    assert len(requests) == 8
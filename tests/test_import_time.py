@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+
+# microseconds a warm (bytecode cached) import textile may take.  It's well
+# under this on a typical machine, the margin is for slow CI runners.
+IMPORT_BUDGET = 100000
+
+# modules which are only imported once they're needed
+LAZY_MODULES = ['html5lib', 'PIL', 'uuid', 'urllib.parse',
+                'xml.etree.ElementTree']
+
+
+def import_times(tmp_path):
+    """Import textile in a fresh interpreter with -X importtime, returning
+    the cumulative time and the modules imported by it."""
+    env = dict(os.environ, PYTHONPYCACHEPREFIX=str(tmp_path))
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    command = [sys.executable, '-X', 'importtime', '-c', 'import textile']
+    output = subprocess.run(command, env=env, stderr=subprocess.PIPE,
+            universal_newlines=True, check=True).stderr
+    lines = [line.split('|') for line in output.splitlines()
+             if line.startswith('import time:') and 'cumulative' not in line]
+    # each module is listed after the ones it imported, which are indented
+    # further, so textile's are those before it back to the next top level one
+    index = [name.strip() for _, _, name in lines].index('textile')
+    modules = []
+    for _, _, name in reversed(lines[:index]):
+        if not name.startswith('   '):
+            break
+        modules.append(name.strip())
+    return int(lines[index][1]), modules
+
+
+def test_import_time(tmp_path):
+    import_times(tmp_path)
+    best, modules = min(import_times(tmp_path) for _ in range(3))
+    assert 'textile.core' in modules
+    for module in LAZY_MODULES:
+        assert module not in modules
+    assert best < IMPORT_BUDGET
@@ -0,0 +1,31 @@
+import pytest
+
+from textile import parallel
+from textile.textilefactory import TextileFactory
+
+texts = ['paragraph *{0}*\n\n# one\n# two'.format(i) for i in range(25)]
+
+
+def test_ParallelTextileFactory():
+    f = parallel.ParallelTextileFactory(workers=2, chunksize=3)
+    result = list(f.process_many(texts))
+    expect = list(TextileFactory().process_many(texts))
+    assert result == expect
+
+    f = parallel.ParallelTextileFactory(workers=2, chunksize=4,
+            restricted=True)
+    result = list(f.process_many(iter(texts)))
+    expect = [TextileFactory(restricted=True).process(t) for t in texts]
+    assert result == expect
+
+    with pytest.raises(ValueError) as ve:
+        parallel.ParallelTextileFactory(chunksize=0)
+    assert 'chunksize must be at least 1' in str(ve.value)
+
+
+def test_textile_many():
+    result = list(parallel.textile_many(texts[:5], workers=1,
+        html_type='html5'))
+    expect = list(TextileFactory(html_type='html5').process_many(texts[:5]))
+    assert result == expect
+    assert list(parallel.textile_many([])) == []
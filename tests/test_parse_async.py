@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import asyncio
+import time
+
+from textile import Textile
+from textile.tools import imagesize
+
+from test_imagesize import PNG_SIZE, png
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_parse_async_README():
+    with open('README.textile') as f:
+        readme = f.read()
+    with open('tests/fixtures/README.txt') as f:
+        expect = f.read()
+
+    t = Textile()
+    assert run(t.parse_async(readme)) == expect
+    # in an executor, and several at once on the same instance
+    t.async_executor_threshold = 0
+    async def parse_all():
+        return await asyncio.gather(*[t.parse_async(readme)
+            for _ in range(4)])
+    assert run(parse_all()) == [expect] * 4
+    assert run(t.parse_async('  ')) == '  '
+
+
+async def serve_images(requests, delay=0.2):
+    """Start a local http server which serves a png at any path after delay
+    seconds, recording in requests the path of each request and the most
+    being served at once."""
+    body = png(*PNG_SIZE)
+    serving = []
+
+    async def handle(reader, writer):
+        request = await reader.readline()
+        while (await reader.readline()).strip():
+            pass
+        requests['paths'].append(request.split()[1].decode('ascii'))
+        serving.append(None)
+        requests['most'] = max(requests['most'], len(serving))
+        await asyncio.sleep(delay)
+        serving.pop()
+        writer.write(b'HTTP/1.0 200 OK\r\nContent-Type: image/png\r\n'
+                     b'Content-Length: ' + str(len(body)).encode('ascii') +
+                     b'\r\n\r\n' + body)
+        await writer.drain()
+        writer.close()
+
+    return await asyncio.start_server(handle, '127.0.0.1', 0)
+
+
+def test_parse_async_get_sizes():
+    imagesize.shared_size_cache().clear()
+    requests = {'paths': [], 'most': 0}
+
+    async def main():
+        server = await serve_images(requests)
+        base = 'http://127.0.0.1:{0}'.format(
+            server.sockets[0].getsockname()[1])
+        t = Textile(get_sizes=True)
+        t.async_concurrency = 2
+        texts = ['!{0}/{1}.png!'.format(base, i) for i in range(5)]
+        # an image as the text of a link
+        texts.append('"!{0}/5.png!":http://example.com/'.format(base))
+
+        # the event loop carries on while the sizes are fetched
+        ticks = []
+        async def tick():
+            while True:
+                ticks.append(time.time())
+                await asyncio.sleep(0.01)
+        ticker = asyncio.ensure_future(tick())
+        try:
+            results = await asyncio.gather(*[t.parse_async(text)
+                for text in texts])
+            again = await t.parse_async(texts[0])
+        finally:
+            ticker.cancel()
+            server.close()
+            await server.wait_closed()
+        return base, results, again, ticks
+
+    base, results, again, ticks = run(main())
+    img = '<img alt="" height="{1}" src="{0}/{{0}}.png" width="{2}" />'.format(
+        base, PNG_SIZE[1], PNG_SIZE[0])
+    assert results == ['\t<p>{0}</p>'.format(img.format(i)) for i in range(5)] + [
+        '\t<p><a href="http://example.com/">{0}</a></p>'.format(img.format(5))]
+    assert sorted(requests['paths']) == ['/{0}.png'.format(i)
+                                         for i in range(6)]
+    # no more than async_concurrency texts at once
+    assert requests['most'] == 2
+    assert len(ticks) > 20
+    # the sizes are cached for the next parse
+    assert again == results[0]
+    assert len(requests['paths']) == 6
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import io
+
+from textile import Textile
+
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def test_parse_iter_README():
+    with open('README.textile') as f:
+        readme = f.read()
+    with open('tests/fixtures/README.txt') as f:
+        expect = f.read()
+    for size in (1, 7, 100, len(readme)):
+        result = ''.join(Textile().parse_iter(chunked(readme, size)))
+        assert result == expect
+
+
+def test_parse_iter():
+    t = Textile()
+    result = list(t.parse_iter('h1. Title\n\nA *paragraph*.\n\nbc. code\n\n'))
+    expect = ['\t<h1>Title</h1>', '\n\n\t<p>A <strong>paragraph</strong>.</p>',
+              '\n\n<pre><code>code</code></pre>']
+    assert result == expect
+    # shelved items are forgotten once they've been output
+    assert t.shelf == [None] * len(t.shelf)
+
+    text = ('Note[#a] and[1].\n\nnotelist.\n\nnote#a. The note.\n\n'
+            'fn1. The footnote.')
+    t = Textile()
+    result = ''.join(t.parse_iter(text))
+    expect = Textile()
+    expect.linkPrefix = t.linkPrefix
+    assert result == expect.parse(text)
+
+    t = Textile(restricted=True, lite=True, noimage=True)
+    result = ''.join(t.parse_iter(['<b>Bold', '</b>\r', '\n\r\nbq. quote']))
+    expect = ('\t<p>&lt;b&gt;Bold&lt;/b&gt;</p>\n\n\t<blockquote>\n\t\t'
+              '<p>quote</p>\n\t</blockquote>')
+    assert result == expect
+
+    assert list(Textile().parse_iter([' \n', '\t'])) == [' \n\t']
+    assert list(Textile().parse_iter([])) == []
+
+    t = Textile(block_tags=False)
+    assert list(t.parse_iter(['*a*\n\n', '_b_'])) == ['<strong>a</strong>\n\n<em>b</em>']
+
+
+def test_parse_iter_link_reference_order():
+    # output linking to a reference defined further on is held back until
+    # it's read, so it's rendered as parse() renders it
+    text = ('"a":ref\n\nb\n\n"!c.png!":/c\n\nd\n\n[ref]http://example.com'
+            '\n\n"e":ref\n\n"f":/f')
+    assert ''.join(Textile().parse_iter(text)) == Textile().parse(text)
+    read = []
+    def lines():
+        for line in text.splitlines(True):
+            read.append(line)
+            yield line
+    output = [(html, len(read)) for html in Textile().parse_iter(lines())]
+    expect = [('\t<p><a href="http://example.com">a</a></p>', 11),
+              ('\n\n\t<p>b</p>', 11),
+              ('\n\n\t<p><a href="/c"><img alt="" src="c.png" /></a></p>', 11),
+              ('\n\n\t<p>d</p>', 11),
+              ('\n\n\n\n\t<p><a href="http://example.com">e</a></p>', 13),
+              ('\n\n\t<p><a href="/f">f</a></p>', 13)]
+    assert output == expect
+    # and a name which is never defined is left as it is
+    text = '"a":ref\n\nb'
+    assert ''.join(Textile().parse_iter(text)) == Textile().parse(text)
+
+
+def test_render_stream():
+    infile = io.StringIO('p. One\n\np. Two')
+    outfile = io.StringIO()
+    Textile().render_stream(infile, outfile)
+    assert outfile.getvalue() == '\t<p>One</p>\n\n\t<p>Two</p>'
+
+
+def test_parse_iter_latency():
+    # each block is output once the first line of the next one has been read
+    read = []
+    def lines():
+        for line in ['h1. Title\n', '\n', 'bc.. code\n', '\n', 'more\n', '\n',
+                     'p. end\n']:
+            read.append(line)
+            yield line
+    output = []
+    for html in Textile().parse_iter(lines()):
+        output.append((html, len(read)))
+    expect = [('\t<h1>Title</h1>', 3),
+              ('\n\n<pre><code>code\n\nmore</code></pre>', 7),
+              ('\n\n\t<p>end</p>', 7)]
+    assert output == expect
@@ -0,0 +1,31 @@
+from textile import Textile
+
+
+documents = [
+    'See[1] for details.\n\nfn1. Here are the details.',
+    'Another[1] footnote.\n\nfn1. With the same number.',
+    '# one\n# two\n\n#_ three',
+    '#_ continued from nowhere',
+    'A note[#first] reference.\n\nnote#first. The note.\n\nnotelist.',
+    'Back to [#first] again.\n\nnote#first. Second doc.\n\nnotelist.',
+    '"link":ref and @code@\n\n[ref]http://example.com',
+    '"link":ref without a definition',
+    '',
+]
+
+
+def test_parse_many():
+    t = Textile()
+    results = list(t.parse_many(documents))
+    for text, result in zip(documents, results):
+        fresh = Textile()
+        fresh.linkPrefix = t.linkPrefix
+        assert result == fresh.parse(text)
+
+
+def test_parse_many_restores_rel():
+    t = Textile(rel='nofollow')
+    text = '"link":http://example.com'
+    results = list(t.parse_many([text, text], rel='nofollow'))
+    expect = '\t<p><a href="http://example.com" rel="nofollow">link</a></p>'
+    assert results == [expect, expect]
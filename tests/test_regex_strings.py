@@ -0,0 +1,55 @@
+import re
+import unicodedata
+
+import pytest
+
+from textile import _unicode_tables
+from textile import regex_strings
+from textile.regex_strings import char_class, char_ranges, uppercase_chars
+
+
+def test_char_class():
+    ranges = char_ranges(lambda c: c in 'ABCE-^]')
+    assert ranges == [(0x2d, 0x2d), (0x41, 0x43), (0x45, 0x45), (0x5d, 0x5e)]
+    pattern = re.compile('[{0}]'.format(char_class(ranges)))
+    assert ''.join(pattern.findall('ABCDEF-[^]\\')) == 'ABCE-^]'
+
+
+def test_code_point_ranges():
+    assert regex_strings.code_point_ranges([0x45, 0x41, 0x43, 0x42]) == [
+        (0x41, 0x43), (0x45, 0x45)]
+    assert regex_strings.code_point_ranges([]) == []
+
+
+@pytest.mark.skipif(unicodedata.unidata_version not in
+        _unicode_tables.uppercase_added and unicodedata.unidata_version !=
+        _unicode_tables.unidata_version, reason='no table for this version')
+def test_uppercase_table(monkeypatch):
+    monkeypatch.setattr(regex_strings, '_uppercase_chars', None)
+    assert uppercase_chars() == char_class(char_ranges(str.isupper))
+
+
+def test_uppercase_other_version(monkeypatch):
+    # without a table for the version, the class is worked out at runtime
+    monkeypatch.setattr(unicodedata, 'unidata_version', '1.0.0')
+    monkeypatch.setattr(regex_strings, '_uppercase_chars', None)
+    monkeypatch.setattr(regex_strings, 'char_ranges',
+                        lambda test: [(0x41, 0x41)] if test('A') else [])
+    assert uppercase_chars() == 'A'
+    # and each table leaves out what was added after its version
+    added = _unicode_tables.uppercase_added['8.0.0']
+    monkeypatch.setattr(unicodedata, 'unidata_version', '8.0.0')
+    monkeypatch.setattr(regex_strings, '_uppercase_chars', None)
+    upper = re.compile('[{0}]'.format(uppercase_chars()))
+    assert upper.match('\u0041') and upper.match('\u1e9e')
+    assert not upper.match(chr(added[0][0]))
+    assert not upper.match(chr(added[-1][1]))
+
+
+def test_regex_snippets():
+    assert type(regex_strings.regex_snippets) is dict
+    if regex_strings.upper_re_s.startswith('\\p'): # pragma: no cover
+        return
+    upper = re.compile('[{0}]+'.format(regex_strings.upper_re_s))
+    assert upper.findall('ABCdéÉΣ') == ['ABC', 'ÉΣ']
+    assert regex_strings.regex_snippets['abr'] == regex_strings.upper_re_s
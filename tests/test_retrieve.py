@@ -4,3 +4,28 @@ def test_retrieve():
     t = Textile()
     id = t.shelve("foobar")
     assert t.retrieve(id) == 'foobar'
+
+def test_retrieve_nested():
+    t = Textile()
+    inner = t.shelve("<code>a</code>")
+    outer = t.shelve("<b>{0}</b>".format(inner))
+    unknown = '{0}99:s'.format(t.uid)
+    result = t.retrieve('{0} and {1} {0}'.format(outer, unknown))
+    expect = '<b><code>a</code></b> and {0} <b><code>a</code></b>'.format(
+        unknown)
+    assert result == expect
+    # url tokens are left for retrieveURLs, even in shelved text
+    url = t.shelveURL('http://example.com/')
+    link = t.shelve('<a href="{0}">a</a>'.format(url))
+    result = t.retrieve('{0} {1}'.format(link, url))
+    assert result == '<a href="{0}">a</a> {0}'.format(url)
+    assert t.retrieveURLs(result) == (
+        '<a href="http://example.com/">a</a> http://example.com/')
+
+def test_retrieve_forged_token():
+    t = Textile()
+    # removing the uid from the input mustn't leave a new one behind
+    forged = '{0}{1}{2}0:s'.format(t.uid[:2], t.uid, t.uid[2:])
+    result = t.parse('"link":http://example.com {0}'.format(forged))
+    expect = '\t<p><a href="http://example.com">link</a> 0:s</p>'
+    assert result == expect
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import re
+import time
+from html import unescape
+from html.parser import HTMLParser
+
+import pytest
+
+import textile
+from textile.tools.sanitizer import sanitize, sanitize_css
+
+from test_values import html_known_values, xhtml_known_values
+
+def test_sanitize():
+    for html, expect in [
+        # tags and attributes Textile doesn't produce are taken out
+        ('<a href="/x" onclick="evil()">y</a>', '<a href="/x">y</a>'),
+        ('<img src=x onerror=alert(1)>', '<img src="x">'),
+        ('<IMG SRC="x.png" ONLOAD="evil()" />', '<img src="x.png" />'),
+        ('<script>alert(1)</script>', '&lt;script&gt;alert(1)&lt;/script&gt;'),
+        ('<svg onload="evil()"><p>x</p></svg>',
+         '&lt;svg onload="evil()"&gt;<p>x</p>&lt;/svg&gt;'),
+        ('<iframe src="//evil"></iframe>',
+         '&lt;iframe src="//evil"&gt;&lt;/iframe&gt;'),
+        ('<p title=\'a"b\' class=c>x</p>',
+         '<p title="a&quot;b" class="c">x</p>'),
+        ('<p title="&#8217; & &quot;">x</p>',
+         '<p title="&#8217; &amp; &quot;">x</p>'),
+        # as are urls with other schemes, however they're spelt
+        ('<a href="javascript:alert(1)">x</a>', '<a>x</a>'),
+        ('<a href="JaVaScRiPt:alert(1)">x</a>', '<a>x</a>'),
+        ('<a href="jav&#x61;script:alert(1)">x</a>', '<a>x</a>'),
+        ('<a href="&#106;avascript:alert(1)">x</a>', '<a>x</a>'),
+        ('<a href=" java\tscript:alert(1)">x</a>', '<a>x</a>'),
+        ('<a href="vbscript:x">x</a>', '<a>x</a>'),
+        ('<img src="data:text/html,&lt;script&gt;">', '<img>'),
+        ('<img src="data:image/png;base64,AAAA">',
+         '<img src="data:image/png;base64,AAAA">'),
+        ('<a href="mailto:a@example.com?subject=a&amp;b=c">x</a>',
+         '<a href="mailto:a@example.com?subject=a&amp;b=c">x</a>'),
+        ('<blockquote cite="javascript:x">x</blockquote>',
+         '<blockquote>x</blockquote>'),
+        # and css which isn't known to be harmless
+        ('<p style="width: expression(alert(1));">x</p>', '<p style="">x</p>'),
+        ('<p style="background: url(javascript:alert(1))">x</p>',
+         '<p style="">x</p>'),
+        ('<p style="color:red;behavior:url(x.htc)">x</p>',
+         '<p style="color:red;">x</p>'),
+        ('<p style="width&#58;expression&#40;alert&#40;1&#41;&#41;">x</p>',
+         '<p style="">x</p>'),
+        # comments, doctypes and the like are dropped
+        ('a<!-- <script>alert(1)</script> -->b', 'ab'),
+        ('a<!-- unterminated', 'a'),
+        ('<!DOCTYPE html><?php x ?>a', 'a'),
+        # text is escaped, leaving character references alone
+        ('a < b > c & d &amp; &#169; &nbsp;',
+         'a &lt; b &gt; c &amp; d &amp; &#169; &nbsp;'),
+        ('<a href="x', '&lt;a href="x'),
+        ('<a title="x>y">z</a>', '<a title="x>y">z</a>'),
+        # tags left open are closed, and stray end tags dropped
+        ('<div><p><b>x', '<div><p><b>x</b></p></div>'),
+        ('<b><i>x</b></i>', '<b><i>x</i></b>'),
+        ('</div>x</br>', 'x'),
+        ('<table><tr><td colspan="2" onmouseover="x">a',
+         '<table><tr><td colspan="2">a</td></tr></table>'),
+    ]:
+        assert sanitize(html) == expect
+
+def test_sanitize_unclosed_tags():
+    # each < which can't start a tag is escaped once, rather than every one
+    # being scanned to the end of the text, which took seconds
+    for html in ['<a"' * 20000, "<a '\"" * 20000, '<!' * 20000,
+                 '<b>' + '<a title="' * 20000]:
+        start = time.time()
+        result = sanitize(html)
+        assert time.time() - start < 1
+        assert '<' not in result.replace('<b>', '').replace('</b>', '')
+    # while a quoted value may hold a >
+    assert sanitize('<a"<b>x') == '&lt;a"<b>x</b>'
+    assert sanitize('<a"<b>x"<i>y') == '<a>y</a>'
+
+
+def test_sanitize_css():
+    assert sanitize_css('padding-left:1em;text-align:left;') == (
+        'padding-left:1em;text-align:left;')
+    assert sanitize_css('color: red; position: fixed; margin: 0 auto') == (
+        'color: red; margin: 0 auto')
+    assert sanitize_css('border: 1px solid expression') == ''
+    assert sanitize_css('font-family: "a; b"') == ''
+
+def test_sanitize_textile():
+    # links are put back before the output is sanitized, so they're kept
+    result = textile.Textile().parse('"a":http://example.com/?a=1&b=2 '
+        '!/i.png! "b":javascript:alert(1)', sanitize=True)
+    expect = ('\t<p><a href="http://example.com/?a=1&amp;b=2">a</a> '
+              '<img alt="" src="/i.png" /> &#8220;b&#8221;:javascript:alert(1)'
+              '</p>')
+    assert result == expect
+    # and Textile's own output is left as it is
+    with open('README.textile') as f:
+        readme = f.read()
+    with open('tests/fixtures/README.txt') as f:
+        expect = f.read()
+    assert textile.Textile().parse(readme, sanitize=True) == expect
+
+
+def summary(html):
+    """The tags and attributes in html, and its text with any character
+    references replaced."""
+    markup, text = set(), []
+
+    class Parser(HTMLParser):
+        def handle_starttag(self, tag, attrs):
+            markup.add((tag, None, None))
+            markup.update((tag, name, re.sub(r'\s', '', value or ''))
+                          for name, value in attrs)
+        handle_startendtag = handle_starttag
+
+        def handle_data(self, data):
+            text.append(data)
+
+    Parser(convert_charrefs=True).feed(html)
+    return markup, ' '.join(unescape(''.join(text)).split())
+
+@pytest.mark.filterwarnings('ignore::DeprecationWarning')
+def test_sanitize_against_html5lib():
+    pytest.importorskip('html5lib')
+    with open('README.textile') as f:
+        readme = f.read()
+    texts = [text for text, _ in xhtml_known_values + html_known_values]
+    for text in texts + [readme]:
+        html = textile.textile(text)
+        markup, words = summary(sanitize(html))
+        html5lib_markup, html5lib_words = summary(sanitize(html,
+            html5lib=True))
+        # nothing html5lib takes out is let through, except that a table's
+        # body isn't added
+        assert markup - html5lib_markup <= {('tbody', None, None)}
+        assert words == html5lib_words
+    result = textile.Textile().parse('<b>a</b>', sanitize='html5lib')
+    assert result == '\t<p><b>a</b></p>'
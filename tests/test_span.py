@@ -17,3 +17,13 @@ def test_span():
     result = t.span('_-*test*-_')
     expect = '<em><del>*test*</del></em>'
     assert result == expect
+
+def test_span_unpaired_delimiters():
+    t = Textile()
+    result = t.span('a lone * and a lone _ stay put, like ^this')
+    expect = 'a lone * and a lone _ stay put, like ^this'
+    assert result == expect
+
+    result = t.span('*bold _not em* here_')
+    expect = '<strong>bold <em>not em</strong> here</em>'
+    assert result == expect
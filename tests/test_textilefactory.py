@@ -26,3 +26,10 @@ def test_TextileFactory():
     with pytest.raises(ValueError) as ve:
         f = textilefactory.TextileFactory(html_type='invalid')
     assert "html_type must be 'xhtml' or 'html5'" in str(ve.value)
+
+def test_TextileFactory_process_many():
+    f = textilefactory.TextileFactory(restricted=True)
+    texts = ['some *text* here', '"link":http://example.com', 'more']
+    result = list(f.process_many(texts))
+    expect = [f.process(text) for text in texts]
+    assert result == expect
@@ -7,19 +7,19 @@ def test_urls():
     assert t.relURL("http://www.google.com/") == 'http://www.google.com/'
 
     result = t.links('fooobar "Google":http://google.com/foobar/ and hello world "flickr":http://flickr.com/photos/jsamsa/ ')
-    expect = 'fooobar {0}2:shelve and hello world {0}4:shelve '.format(t.uid)
+    expect = 'fooobar {0}0:s and hello world {0}1:s '.format(t.uid)
     assert result == expect
 
     result = t.links('""Open the door, HAL!"":https://xkcd.com/375/')
-    expect = '{0}6:shelve'.format(t.uid)
+    expect = '{0}2:s'.format(t.uid)
     assert result == expect
 
     result = t.links('"$":http://domain.tld/test_[brackets]')
-    expect = '{0}8:shelve'.format(t.uid)
+    expect = '{0}3:s'.format(t.uid)
     assert result == expect
 
     result = t.links('<em>"$":http://domain.tld/test_</em>')
-    expect = '<em>{0}10:shelve</em>'.format(t.uid)
+    expect = '<em>{0}4:s</em>'.format(t.uid)
     assert result == expect
 
     expect = '"":test'
@@ -34,7 +34,7 @@ def test_urls():
     expect = ''
     assert result == expect
 
-    result = t.retrieveURLs('{0}2:url'.format(t.uid))
+    result = t.retrieveURLs('{0}99:u'.format(t.uid))
     expect = ''
     assert result == expect
 
@@ -67,3 +67,26 @@ def test_quotes_in_link_text():
     result = t.parse(test)
     expect = '\t<p><a href="url">&#8220;this is a quote in link text&#8221;</a></p>'
     assert result == expect
+
+def test_mark_start_of_links():
+    t = Textile()
+    marker = '{0}linkStartMarker:'.format(t.uid)
+    tests = [
+        ('no links here', 'no links here'),
+        ('A "link":http://x.com and "b"',
+         'A {0}"link":http://x.com and "b"'),
+        ('he said "x "y":http://a', 'he said "x {0}"y":http://a'),
+        ('say ""Open the door, HAL!"":url',
+         'say {0}""Open the door, HAL!"":url'),
+        ('"a\n":http://x', '{0}"a\n":http://x'),
+        # unbalanced quotes all the way back are given a quote of their own
+        ('x" b":http://x', '{0}"x" b":http://x'),
+        ('"a":b "c":d', '{0}"a":b {0}"c":d'),
+    ]
+    for text, expect in tests:
+        assert t.markStartOfLinks(text) == expect.format(marker)
+
+def test_array_assignment_in_url():
+    result = Textile().parse('"array":http://example.com/?q[]=a&q[]=b')
+    expect = '\t<p><a href="http://example.com/?q[]=a&q[]=b">array</a></p>'
+    assert result == expect
@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import timeit
+from xml.etree import ElementTree
+
 from textile import utils
 
 def test_encode_html():
@@ -9,15 +12,59 @@ def test_encode_html():
     expect = ('this is a &quot;test&quot; of text that&#39;s safe to put in '
             'an &lt;html&gt; attribute.')
     assert result == expect
+    assert utils.encode_html('"<&>"', quotes=False) == '"&lt;&amp;&gt;"'
+
+def test_encode_html_many():
+    texts = ['<a href="x">', '', "it's", 'a\nb & c', '&amp;']
+    for quotes in (True, False):
+        expect = [utils.encode_html(text, quotes) for text in texts]
+        assert utils.encode_html_many(texts, quotes) == expect
+        assert utils.encode_html_many(iter(texts), quotes) == expect
+    assert utils.encode_html_many([]) == []
+    assert utils.encode_html_many(['']) == ['']
+    # texts which contain the separator are encoded one at a time
+    assert utils.encode_html_many(['a\0<', '>']) == ['a\0&lt;', '&gt;']
 
 def test_has_raw_text():
     assert utils.has_raw_text('<p>foo bar biz baz</p>') is False
     assert utils.has_raw_text(' why yes, yes it does') is True
+    assert utils.has_raw_text('') is False
+    assert utils.has_raw_text(' <div>a</div>\n<p>b</p> ') is False
+    # a block runs to the last closing tag with its name
+    assert utils.has_raw_text('<p>a</p> b <p>c</p>') is False
+    assert utils.has_raw_text('<div>a</div> b <p>c</p>') is True
+    # a pre with no end is tried as a p
+    assert utils.has_raw_text('<pre>a</p>') is False
+    assert utils.has_raw_text('<p>a') is True
+    assert utils.has_raw_text('<p>a</p><br />') is False
+    assert utils.has_raw_text('<br /> <hr />') is True
+    assert utils.has_raw_text('<b<p>a</p>r />') is False
+    assert utils.has_raw_text('<p>x ' * 2000) is True
 
 def test_is_rel_url():
     assert utils.is_rel_url("http://www.google.com/") is False
     assert utils.is_rel_url("/foo") is True
 
+def test_trim_url():
+    assert utils.trim_url('http://a.com/') == ('http://a.com/', '', '', False)
+    assert utils.trim_url('http://a.com/x).,') == ('http://a.com/x', ').,', '',
+            False)
+    assert utils.trim_url('http://a.com/(x)') == ('http://a.com/(x)', '', '',
+            False)
+    assert utils.trim_url('http://a.com/x</a>') == ('http://a.com/x', '</a>',
+            '', False)
+    assert utils.trim_url('http://a.com/x]') == ('http://a.com/x', '', '',
+            True)
+    assert utils.trim_url('http://a.com/x][1]') == ('http://a.com/x', '',
+            '[1]', True)
+    assert utils.trim_url('http://a.com/?q[]=x]y') == ('http://a.com/?q[]=x',
+            '', 'y', True)
+    # every square bracket part of an array assignment, and a stray >
+    assert utils.trim_url('http://a.com/?q[]=a&q[]=b') == (
+            'http://a.com/?q[]=a&q[]=b', '', '', False)
+    assert utils.trim_url('http://a.com/x>') == ('http://a.com/x', '', '',
+            False)
+
 def test_generate_tag():
     result = utils.generate_tag('span', 'inner text', {'class': 'test'})
     expect = '<span class="test">inner text</span>'
@@ -28,3 +75,64 @@ def test_generate_tag():
     expect = '<a href="http://de.wikipedia.org/wiki/%C3%C9bermensch">Übermensch</a>'
     result = utils.generate_tag('a', text, attributes)
     assert result == expect
+
+    result = utils.generate_tag('p', 'no attributes')
+    expect = '<p>no attributes</p>'
+    assert result == expect
+
+    assert utils.generate_tag('', 'no tag') == 'no tag'
+
+
+def elementtree_generate_tag(tag, content, attributes):
+    """The ElementTree implementation generate_tag used to have."""
+    if not tag:
+        return content
+    element = ElementTree.Element(tag, attrib=attributes)
+    if len(element.attrib) > 1:
+        attribs = sorted(element.attrib.items())
+        element.attrib.clear()
+        element.attrib.update(attribs)
+    element_tag = ElementTree.tostringlist(element, encoding='unicode',
+            method='html')
+    element_tag.insert(len(element_tag) - 1, content)
+    return ''.join(element_tag)
+
+
+generate_tag_cases = (
+    ('p', 'text', {}),
+    ('img', ' /', {'src': '/a.png', 'alt': 'x & "y" <z>', 'title': 'x'}),
+    ('IMG', ' /', {'src': 'b'}),
+    ('br', '', {}),
+    ('a', 'link', {'href': 'http://a/?b=c&d=e', 'rel': 'nofollow'}),
+    ('td', 'cell', {'style': 'text-align:left;', 'colspan': '2',
+                    'class': 'c', 'rowspan': '3'}),
+    ('span', 'Übermensch', {'lang': 'de'}),
+    ('', 'no tag', {'class': 'x'}),
+)
+
+
+def test_generate_tag_matches_elementtree():
+    for tag, content, attributes in generate_tag_cases:
+        expect = elementtree_generate_tag(tag, content, attributes)
+        assert utils.generate_tag(tag, content, attributes) == expect
+
+
+def test_generate_tag_benchmark():
+    def run(function):
+        for tag, content, attributes in generate_tag_cases:
+            function(tag, content, attributes)
+    old = min(timeit.repeat(lambda: run(elementtree_generate_tag),
+        number=200, repeat=3))
+    new = min(timeit.repeat(lambda: run(utils.generate_tag), number=200,
+        repeat=3))
+    assert new * 2 < old
+
+def test_iter_blocks():
+    text = '  first\r\nblock  \n \t\n\nsecond"\n\n \n'
+    result = list(utils.iter_blocks(['  fir', 'st\r', '\nblock  \n \t\n\nsec',
+        'ond"\n\n \n']))
+    expect = ['first\nblock  ', '\n\n\n', 'second" ']
+    assert result == expect
+    assert result == utils.re.split(r'(\n{2,})',
+            utils.normalize_newlines(text))
+    assert list(utils.iter_blocks([' \n\t '])) == []
@@ -1,6 +1,114 @@
 import argparse
+import fnmatch
+import glob
+import io
+import os
 import sys
+import time
+from collections import deque
+
 import textile
+from textile.textilefactory import TextileFactory
+
+
+def size(value):
+    """Parse a size in bytes, optionally with a K, M or G suffix."""
+    units = {'K': 2 ** 10, 'M': 2 ** 20, 'G': 2 ** 30}
+    multiplier = units.get(value[-1:].upper(), 1)
+    if multiplier != 1:
+        value = value[:-1]
+    try:
+        return int(value) * multiplier
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid size: {0!r}".format(value))
+
+
+def find_files(paths, patterns):
+    """Find the files to convert, yielding the path of each along with the
+    path of its output relative to the output directory.  Directories are
+    searched for files matching any of the glob patterns, and the paths may
+    be glob patterns themselves.  The directory structure below a directory
+    (or below the part of a pattern without wildcards) is kept."""
+    for path in paths:
+        if any(c in path for c in '*?['):
+            parts = path.split(os.sep)
+            for i, part in enumerate(parts):
+                if any(c in part for c in '*?['):
+                    break
+            base = os.sep.join(parts[:i])
+            matches = sorted(glob.glob(path, recursive=True))
+        elif os.path.isdir(path):
+            base, matches = path, []
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                matches.extend(os.path.join(root, name) for name in
+                        sorted(names) if any(fnmatch.fnmatch(name, pattern)
+                            for pattern in patterns))
+        else:
+            base, matches = os.path.dirname(path), [path]
+        for match in matches:
+            if os.path.isfile(match):
+                target = os.path.relpath(match, base or os.curdir)
+                yield match, '{0}.html'.format(os.path.splitext(target)[0])
+
+
+def unique_targets(files):
+    """Return the (path, target) files as a list, without any file which is
+    found more than once.  Raises ValueError if two different files would be
+    written to the same target."""
+    result, sources = [], {}
+    for path, target in files:
+        key = os.path.normcase(os.path.normpath(target))
+        source = os.path.realpath(path)
+        if key not in sources:
+            sources[key] = (source, path)
+            result.append((path, target))
+        elif sources[key][0] != source:
+            raise ValueError('{0} and {1} would both be converted to '
+                    '{2}'.format(sources[key][1], path, target))
+    return result
+
+
+def convert_files(files, output_dir, jobs=None, cache=None):
+    """Convert the (path, target) files, writing the output to the targets
+    under output_dir.  Returns the number of files and of bytes read."""
+    if jobs == 1:
+        factory = TextileFactory()
+    else:
+        from textile.parallel import ParallelTextileFactory
+        factory = ParallelTextileFactory(workers=jobs)
+    stats = {'files': 0, 'bytes': 0}
+    # the files being converted, in the order their output comes back
+    pending = deque()
+
+    def write(target, html):
+        target = os.path.join(output_dir, target)
+        os.makedirs(os.path.dirname(target) or os.curdir, exist_ok=True)
+        with io.open(target, 'w', encoding='utf-8') as f:
+            f.write(html)
+
+    def texts():
+        for path, target in files:
+            with io.open(path, encoding='utf-8') as f:
+                text = f.read()
+            stats['files'] += 1
+            stats['bytes'] += len(text.encode('utf-8'))
+            key, html = None, None
+            if cache is not None:
+                key = factory.cache_key(text)
+                html = cache.lookup(key)
+            if html is None:
+                pending.append((target, key))
+                yield text
+            else:
+                write(target, html)
+
+    for html in factory.process_many(texts()):
+        target, key = pending.popleft()
+        if cache is not None:
+            cache.set(key, html)
+        write(target, html)
+    return stats['files'], stats['bytes']
 
 
 def main():
@@ -11,24 +119,93 @@ def main():
     description = ('A simple command line interface for textile module '
                    'to convert textile input to HTML output.  This script '
                    'accepts input as a file or stdin and can write out to '
-                   'a file or stdout.')
+                   'a file or stdout.  With --output-dir, any number of '
+                   'files and directories are converted into that directory '
+                   'instead.')
     parser = argparse.ArgumentParser(prog=prog, description=description)
     parser.add_argument('-v', '--version', action='store_true',
                         help='show the version number and exit')
-    parser.add_argument('infile', nargs='?', type=argparse.FileType(),
-                        help='a textile file to be converted')
-    parser.add_argument('outfile', nargs='?', type=argparse.FileType('w'),
-                        help='write the output of infile to outfile')
+    parser.add_argument('paths', nargs='*', metavar='infile [outfile]',
+                        help='a textile file to be converted, and the file to '
+                        'write its output to.  With --output-dir: the files, '
+                        'directories and glob patterns to convert')
+    parser.add_argument('-o', '--output-dir', metavar='DIR',
+                        help='convert all the files given into DIR, keeping '
+                        'the structure of the directories given')
+    parser.add_argument('--glob', action='append', metavar='PATTERN',
+                        help='convert the files in the directories given '
+                        'which match PATTERN (default: *.textile).  Can be '
+                        'given more than once')
+    parser.add_argument('-j', '--jobs', type=int, metavar='N',
+                        help='the number of worker processes used with '
+                        '--output-dir (default: the number of CPUs)')
+    parser.add_argument('--stream', action='store_true',
+                        help='read the input a block at a time and write the '
+                        'output of each block as soon as it is converted, '
+                        'without holding the whole document in memory.  '
+                        'Output linking to a link reference which is defined '
+                        'further on is held back until the reference is read')
+    parser.add_argument('--cache-dir', metavar='DIR',
+                        help='keep the output in DIR, so unchanged input is '
+                        'not converted again')
+    parser.add_argument('--prune-cache', metavar='SIZE', type=size,
+                        help='remove the least recently used output from the '
+                        'cache until it takes up no more than SIZE bytes (K, '
+                        'M or G suffixes are allowed), and exit')
     options = parser.parse_args()
 
     if options.version:
         print(textile.VERSION)
         sys.exit()
 
-    infile = options.infile or sys.stdin
-    outfile = options.outfile or sys.stdout
+    cache = None
+    if options.cache_dir is not None:
+        from textile.cache import DiskCache
+        cache = DiskCache(options.cache_dir)
+    if options.prune_cache is not None:
+        if cache is None:
+            parser.error('--prune-cache requires --cache-dir')
+        cache.prune(options.prune_cache)
+        sys.exit()
+
+    if options.stream and (options.output_dir or cache):
+        parser.error('--stream can not be used with --output-dir or '
+                '--cache-dir')
+
+    if options.output_dir is not None:
+        if options.jobs is not None and options.jobs < 1:
+            parser.error('--jobs must be at least 1')
+        start = time.time()
+        try:
+            files = unique_targets(find_files(options.paths,
+                options.glob or ['*.textile']))
+        except ValueError as e:
+            parser.error(str(e))
+        count, nbytes = convert_files(files, options.output_dir,
+                jobs=options.jobs, cache=cache)
+        elapsed = max(time.time() - start, 1e-6)
+        sys.stderr.write('Converted {0} files ({1:.2f} MB) in {2:.2f}s: '
+                '{3:.1f} files/s, {4:.2f} MB/s\n'.format(count, nbytes / 1e6,
+                    elapsed, count / elapsed, nbytes / 1e6 / elapsed))
+        return
+
+    if len(options.paths) > 2:
+        parser.error('use --output-dir to convert more than one file')
+    infile, outfile = sys.stdin, sys.stdout
+    try:
+        if options.paths:
+            infile = argparse.FileType()(options.paths[0])
+        if len(options.paths) > 1:
+            outfile = argparse.FileType('w')(options.paths[1])
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    if options.stream:
+        with infile, outfile:
+            textile.Textile().render_stream(infile, outfile, flush=True)
+        return
     with infile:
-        output = textile.textile(''.join(infile.readlines()))
+        text = ''.join(infile.readlines())
+        output = TextileFactory(cache=cache).process(text)
     with outfile:
         outfile.write(output)
 
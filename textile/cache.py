@@ -0,0 +1,220 @@
+from __future__ import unicode_literals
+
+import abc
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+
+from .version import VERSION
+
+# the names of the directories and files DiskCache keeps html in
+hex_dir_re = re.compile(r'[0-9a-f]{2}\Z')
+hex_file_re = re.compile(r'[0-9a-f]+\Z')
+
+
+def cache_key(text, options):
+    """Return the key for the html rendered from text with the given options
+    (a dict of the Textile settings): a sha256 hash of the text, the options
+    and the version of textile."""
+    digest = hashlib.sha256(json.dumps([VERSION, options],
+        sort_keys=True).encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(text.encode('utf-8', 'surrogatepass'))
+    return digest.hexdigest()
+
+
+class RenderCache(abc.ABC):
+    """The interface for caches of rendered html.  A backend implements get,
+    set and clear; lookup and fetch look html up through them, counting the
+    hits and misses.  A backend missing any of them can't be created."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        # guards the counts, and a backend's own state if it likes
+        self._lock = threading.Lock()
+
+    @abc.abstractmethod
+    def get(self, key):
+        """Return the html stored under key, or None if there isn't any."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def set(self, key, html):
+        """Store the html under key."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def clear(self):
+        """Remove everything from the cache."""
+        raise NotImplementedError
+
+    def lookup(self, key):
+        """Return the html stored under key, or None if there isn't any,
+        counting it as a hit or a miss.  The caller is expected to set the
+        html after a miss."""
+        html = self.get(key)
+        with self._lock:
+            if html is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return html
+
+    def fetch(self, key, render):
+        """Return the html stored under key.  If there isn't any, it's made
+        by calling render() and stored."""
+        html = self.lookup(key)
+        if html is None:
+            html = render()
+            self.set(key, html)
+        return html
+
+
+class LRUCache(RenderCache):
+    """An in-memory cache holding at most maxsize documents, and at most
+    maxbytes bytes of html if that's given.  The least recently used
+    documents are evicted first.  It's safe to share between threads."""
+
+    def __init__(self, maxsize=1024, maxbytes=None):
+        super(LRUCache, self).__init__()
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.nbytes = 0
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        with self._lock:
+            html = self._items.get(key)
+            if html is not None:
+                self._items.move_to_end(key)
+            return html
+
+    def set(self, key, html):
+        size = sys.getsizeof(html)
+        with self._lock:
+            if key in self._items:
+                self.nbytes -= sys.getsizeof(self._items.pop(key))
+            if self.maxbytes is not None and size > self.maxbytes:
+                return
+            self._items[key] = html
+            self.nbytes += size
+            while len(self._items) > self.maxsize or (self.maxbytes is not
+                    None and self.nbytes > self.maxbytes):
+                self.nbytes -= sys.getsizeof(self._items.popitem(False)[1])
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.nbytes = 0
+
+
+class DiskCache(RenderCache):
+    """A cache keeping each document's html in a file under directory, which
+    is created if need be.  Files are written to a temporary name and then
+    renamed into place, so a reader never sees a partly written one, and
+    several processes can share the directory.  Storing is best effort: if
+    the html can't be written, it just isn't cached."""
+
+    def __init__(self, directory):
+        super(DiskCache, self).__init__()
+        self.directory = directory
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key[2:])
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with io.open(path, encoding='utf-8', newline='') as f:
+                html = f.read()
+        except (IOError, OSError):
+            return None
+        try:
+            # the modification time records when it was last used, for prune
+            os.utime(path, None)
+        except OSError: # pragma: no cover
+            pass
+        return html
+
+    def set(self, key, html):
+        path = self.path(key)
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix='.tmp', dir=directory)
+        except OSError:
+            return
+        try:
+            with io.open(fd, 'w', encoding='utf-8', newline='') as f:
+                f.write(html)
+            os.replace(tmp, path)
+        except (IOError, OSError):
+            try:
+                os.remove(tmp)
+            except OSError: # pragma: no cover
+                pass
+
+    def _files(self):
+        """The (path, size, last used) of each file in the cache.  Only files
+        laid out as the cache stores them, <key[:2]>/<key[2:]>, are listed,
+        so nothing else which happens to be in the directory is touched, and
+        nor are the temporary files being written."""
+        files = []
+        try:
+            dirs = os.listdir(self.directory)
+        except OSError:
+            return files
+        for name in dirs:
+            if not hex_dir_re.match(name):
+                continue
+            root = os.path.join(self.directory, name)
+            try:
+                names = os.listdir(root)
+            except OSError:
+                continue
+            for name in names:
+                if not hex_file_re.match(name):
+                    continue
+                path = os.path.join(root, name)
+                if not os.path.isfile(path):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError: # pragma: no cover
+                    continue
+                files.append((path, stat.st_size, stat.st_mtime))
+        return files
+
+    def clear(self):
+        for path, size, used in self._files():
+            try:
+                os.remove(path)
+            except OSError: # pragma: no cover
+                pass
+
+    def prune(self, maxbytes):
+        """Remove the least recently used files until the cache takes up no
+        more than maxbytes.  Returns the number of files removed."""
+        files = sorted(self._files(), key=lambda f: f[2], reverse=True)
+        total, removed = 0, 0
+        for path, size, used in files:
+            total += size
+            if total > maxbytes:
+                try:
+                    os.remove(path)
+                except OSError: # pragma: no cover
+                    continue
+                removed += 1
+        return removed
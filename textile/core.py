@@ -17,16 +17,15 @@ Textile's procedural code into a class framework
 Additions and fixes Copyright (c) 2006 Alex Shiels http://thresholdstate.com/
 
 """
-import uuid
-from urllib.parse import urlparse, urlsplit, urlunsplit, quote, unquote
+import itertools
 from collections import OrderedDict
 
 from textile.tools import sanitizer, imagesize
 from textile.regex_strings import (align_re_s, cls_re_s, pnct_re_s,
         regex_snippets, syms_re_s, table_span_re_s)
 from textile.utils import (decode_high, encode_high, encode_html, generate_tag,
-        has_raw_text, is_rel_url, is_valid_url, list_type, normalize_newlines,
-        parse_attributes, pba)
+        has_raw_text, is_rel_url, iter_blocks, list_type, normalize_newlines,
+        parse_attributes, pba, trim_url)
 from textile.objects import Block, Table
 
 try:
@@ -35,6 +34,226 @@ except ImportError:
     import re
 
 
+# Compiled regular expressions are shared by every Textile instance.  The
+# textile() and textile_restricted() helpers create a new instance for each
+# call, so compiling the patterns in __init__ would be paid for every document.
+# Entries are keyed by the regex backend in use plus whatever settings alter
+# the patterns.
+_pattern_registry = {}
+
+# the urls which might be the name of a link reference defined further on
+ref_name_re = re.compile(r'[\w-]+\Z', re.U)
+
+
+def compiled_patterns(key, build):
+    """Return the patterns stored under key, calling build() to create them
+    the first time they are requested."""
+    key = (re.__name__,) + tuple(key)
+    try:
+        return _pattern_registry[key]
+    except KeyError:
+        patterns = _pattern_registry.setdefault(key, build())
+        return patterns
+
+
+def _build_glyph_search():
+    """Compile the glyph regexes.  Returns a tuple of the patterns used for
+    most of the text, the patterns used at the beginning of the string and a
+    dict mapping each pattern to the characters which must be present in the
+    text for it to match."""
+    cur = r''
+    if regex_snippets['cur']: # pragma: no branch
+        cur = r'(?:[{0}]{1}*)?'.format(regex_snippets['cur'],
+                regex_snippets['space'])
+
+    # We'll be searching for characters that need to be HTML-encoded to
+    # produce properly valid html.  These are the defaults that work in most
+    # cases.  Below, we'll copy this and modify the necessary pieces to make it
+    # work for characters at the beginning of the string.
+    glyph_search = [
+        # apostrophe's
+        re.compile(r"(^|{0}|\))'({0})".format(regex_snippets['wrd']),
+            flags=re.U),
+        # back in '88
+        re.compile(r"({0})'(\d+{1}?)\b(?![.]?[{1}]*?')".format(
+            regex_snippets['space'], regex_snippets['wrd']),
+            flags=re.U),
+        # single opening following an open bracket.
+        re.compile(r"([([{])'(?=\S)", flags=re.U),
+        # single closing
+        re.compile(r"(^|\S)'(?={0}|{1}|<|$)".format(
+            regex_snippets['space'], pnct_re_s), flags=re.U),
+        # single opening
+        re.compile(r"'", re.U),
+        # double opening following an open bracket. Allows things like
+        # Hello ["(Mum) & dad"]
+        re.compile(r'([([{])"(?=\S)', flags=re.U),
+        # double closing
+        re.compile(r'(^|\S)"(?={0}|{1}|<|$)'.format(
+            regex_snippets['space'], pnct_re_s), re.U),
+        # double opening
+        re.compile(r'"'),
+        # ellipsis
+        re.compile(r'([^.]?)\.{3}'),
+        # ampersand
+        re.compile(r'(\s?)&(\s)', re.U),
+        # em dash
+        re.compile(r'(\s?)--(\s?)'),
+        # en dash
+        re.compile(r' - '),
+        # dimension sign
+        re.compile(r'([0-9]+[\])]?[\'"]? ?)[x]( ?[\[(]?)'
+            r'(?=[+-]?{0}[0-9]*\.?[0-9]+)'.format(cur), flags=re.I | re.U),
+        # trademark
+        re.compile(r'(\b ?|{0}|^)[([]TM[])]'.format(regex_snippets['space']
+            ), flags=re.I | re.U),
+        # registered
+        re.compile(r'(\b ?|{0}|^)[([]R[])]'.format(regex_snippets['space']
+            ), flags=re.I | re.U),
+        # copyright
+        re.compile(r'(\b ?|{0}|^)[([]C[])]'.format(regex_snippets['space']
+            ), flags=re.I | re.U),
+        # 1/2
+        re.compile(r'[([]1\/2[])]'),
+        # 1/4
+        re.compile(r'[([]1\/4[])]'),
+        # 3/4
+        re.compile(r'[([]3\/4[])]'),
+        # degrees
+        re.compile(r'[([]o[])]'),
+        # plus/minus
+        re.compile(r'[([]\+\/-[])]'),
+        # 3+ uppercase acronym
+        re.compile(r'\b([{0}][{1}]{{2,}})\b(?:[(]([^)]*)[)])'.format(
+            regex_snippets['abr'], regex_snippets['acr']), flags=re.U),
+        # 3+ uppercase
+        re.compile(r'({space}|^|[>(;-])([{abr}]{{3,}})([{nab}]*)'
+            '(?={space}|{pnct}|<|$)(?=[^">]*?(<|$))'.format(**{ 'space':
+                regex_snippets['space'], 'abr': regex_snippets['abr'],
+                'nab': regex_snippets['nab'], 'pnct': pnct_re_s}), re.U),
+    ]
+    # These are the changes that need to be made for characters that occur
+    # at the beginning of the string.
+    glyph_search_initial = list(glyph_search)
+    # apostrophe's
+    glyph_search_initial[0] = re.compile(r"({0}|\))'({0})".format(
+        regex_snippets['wrd']), flags=re.U)
+    # single closing
+    glyph_search_initial[3] = re.compile(r"(\S)'(?={0}|{1}|$)".format(
+            regex_snippets['space'], pnct_re_s), re.U)
+    # double closing
+    glyph_search_initial[6] = re.compile(r'(\S)"(?={0}|{1}|<|$)'.format(
+            regex_snippets['space'], pnct_re_s), re.U)
+
+    # Every glyph regex, apart from the 3+ uppercase one, contains a literal
+    # character we can look for before running it.
+    triggers = ("'", "'", "'", "'", "'", '"', '"', '"', '.', '&', '-', '-',
+                'xX', '([', '([', '([', '([', '([', '([', '([', '([', '(')
+    glyph_triggers = {}
+    for patterns in (glyph_search, glyph_search_initial):
+        for pattern, chars in zip(patterns, triggers):
+            glyph_triggers[pattern] = frozenset(chars)
+
+    return tuple(glyph_search), tuple(glyph_search_initial), glyph_triggers
+
+
+def _build_glyph_split():
+    """Compile the regex which splits text on angle-bracketed tags."""
+    return re.compile(r'(<[\w\/!?].*?>)', re.U)
+
+
+def _build_link_start_patterns():
+    """Compile the regexes used to find the start of links.  Returns the
+    pattern matching the '":' between link text and url, and the one matching
+    a character which isn't whitespace."""
+    return (re.compile(r'":(?={0})'.format(regex_snippets['char'])),
+            re.compile(r'\S', flags=re.U))
+
+
+def _build_link_text_pattern():
+    """Compile the regex which splits the text of a link into its
+    attributes, text and title."""
+    return re.compile(r'''^
+        (?P<atts>{0})                # $atts (if any)
+        {1}*                         # any optional spaces
+        (?P<text>                    # $text is...
+            (!.+!)                   #     an image
+        |                            #   else...
+            .+?                      #     link text
+        )                            # end of $text
+        (?:\((?P<title>[^)]+?)\))?   # $title (if any)
+        $'''.format(cls_re_s, regex_snippets['space']), flags=re.X | re.U)
+
+
+def _build_url_patterns():
+    """Compile the regexes used by encode_url: one dividing a netloc into
+    its user, password, host and port, and one matching a path which
+    doesn't need to be encoded."""
+    netloc = re.compile(r"""
+        (?:(?P<user>[^:@]+)(?::(?P<password>[^:@]+))?@)?
+        (?P<host>[^:]+)
+        (?::(?P<port>[0-9]+))?
+    """, re.X | re.U)
+    # the characters quote never encodes ('~' only since python 3.7) and /
+    return netloc, re.compile(r'[A-Za-z0-9_.\-/]*\Z')
+
+
+def _build_image_pattern():
+    """Compile the regex which matches an image."""
+    return re.compile(r"""
+        (?:[\[{{])?         # pre
+        \!                  # opening !
+        (\<|\=|\>)?         # optional alignment atts
+        ({0})               # optional style,class atts
+        (?:\.\s)?           # optional dot-space
+        ([^\s(!]+)          # presume this is the src
+        \s?                 # optional space
+        (?:\(([^\)]+)\))?   # optional title
+        \!                  # closing
+        (?::(\S+))?         # optional href
+        (?:[\]}}]|(?=\s|$)) # lookahead: space or end of string
+    """.format(cls_re_s), re.U | re.X)
+
+
+def _build_span_patterns():
+    """Compile one regex per span delimiter, in the order they're applied.
+    Returns a tuple of (delimiter, pattern) pairs."""
+    qtags = (('**', r'\*\*'), ('*', r'\*'), ('??', r'\?\?'), ('-', r'\-'),
+             ('__', r'__'), ('_', r'_'), ('%', r'%'), ('+', r'\+'),
+             ('~', r'~'), ('^', r'\^'))
+    pnct = r""".,"'?!;:‹›«»„“”‚‘’"""
+    patterns = []
+    for delimiter, tag in qtags:
+        patterns.append((delimiter, re.compile(r"""
+            (?P<pre>^|(?<=[\s>{pnct}\(])|[{{[])
+            (?P<tag>{tag})(?!{tag})
+            (?P<atts>{cls})
+            (?!{tag})
+            (?::(?P<cite>\S+[^{tag}]{space}))?
+            (?P<content>[^{space}{tag}]+|\S.*?[^\s{tag}\n])
+            (?P<end>[{pnct}]*)
+            {tag}
+            (?P<tail>$|[\[\]}}<]|(?=[{pnct}]{{1,2}}[^0-9]|\s|\)))
+        """.format(**{'tag': tag, 'cls': cls_re_s, 'pnct': pnct,
+            'space': regex_snippets['space']}), flags=re.X | re.U)))
+    return tuple(patterns)
+
+
+def _build_block_patterns(tre):
+    """Compile the regexes used by Textile.block.  tre is the alternation of
+    block tags allowed in the current mode."""
+    return {
+        'split': re.compile(r'(\n{2,})'),
+        'tag': re.compile(r'^(?P<tag>{0})(?P<atts>{1}{2})\.(?P<ext>\.?)'
+            r'(?::(?P<cite>\S+))? (?P<content>.*)$'.format(tre, align_re_s,
+                cls_re_s), flags=re.S | re.U),
+        'p_br': re.compile(r'<(p)([^>]*?)>(.*)(</\1>)', re.S),
+        # A newline ending a non-empty line becomes a break tag, unless the
+        # next line starts a list, table or more whitespace.
+        'br': re.compile(r'(?<=.)\n(?![#*;:\s|])'),
+    }
+
+
 class Textile(object):
     restricted_url_schemes = ('http', 'https', 'ftp', 'mailto')
     unrestricted_url_schemes = restricted_url_schemes + ('file', 'tel',
@@ -43,8 +262,32 @@ class Textile(object):
     btag = ('bq', 'bc', 'notextile', 'pre', 'h[1-6]', r'fn\d+', 'p', '###')
     btag_lite = ('bq', 'bc', 'p')
 
+    span_tags = {
+        '*':  'strong',
+        '**': 'b',
+        '??': 'cite',
+        '_':  'em',
+        '__': 'i',
+        '-':  'del',
+        '%':  'span',
+        '+':  'ins',
+        '~':  'sub',
+        '^':  'sup'
+    }
+
     note_index = 1
 
+    # with get_sizes, the seconds to wait for each image's server, and the
+    # number of images fetched at once
+    image_size_timeout = 10
+    image_size_workers = 8
+
+    # with parse_async, the length of text which is parsed in an executor
+    # rather than on the event loop, and the number of texts each instance
+    # works on at once
+    async_executor_threshold = 20000
+    async_concurrency = 8
+
     doctype_whitelist = ['xhtml', 'html5']
 
     glyph_definitions = {
@@ -78,106 +321,40 @@ class Textile(object):
         self.lite = lite
         self.noimage = noimage
         self.get_sizes = get_sizes
-        self.fn = {}
-        self.urlrefs = {}
-        self.shelf = {}
         self.rel = rel
         self.html_type = html_type
         self.max_span_depth = 5
-        self.span_depth = 0
+        # imported here, like urllib.parse below, to keep import textile fast
+        import uuid
         uid = uuid.uuid4().hex
-        self.uid = 'textileRef:{0}:'.format(uid)
+        # the uid prefixes the placeholder tokens put in the text while it's
+        # being parsed, so it's kept short.  It's stripped from the input, so
+        # the tokens can't be forged.
+        self.uid = 'tx{0}:'.format(uid[:8])
         self.linkPrefix = '{0}-'.format(uid)
-        self.linkIndex = 0
-        self.refCache = {}
-        self.refIndex = 0
         self.block_tags = block_tags
+        self._reset_state()
 
-        cur = r''
-        if regex_snippets['cur']: # pragma: no branch
-            cur = r'(?:[{0}]{1}*)?'.format(regex_snippets['cur'],
-                    regex_snippets['space'])
-
-        # We'll be searching for characters that need to be HTML-encoded to
-        # produce properly valid html.  These are the defaults that work in
-        # most cases.  Below, we'll copy this and modify the necessary pieces
-        # to make it work for characters at the beginning of the string.
-        self.glyph_search = [
-            # apostrophe's
-            re.compile(r"(^|{0}|\))'({0})".format(regex_snippets['wrd']),
-                flags=re.U),
-            # back in '88
-            re.compile(r"({0})'(\d+{1}?)\b(?![.]?[{1}]*?')".format(
-                regex_snippets['space'], regex_snippets['wrd']),
-                flags=re.U),
-            # single opening following an open bracket.
-            re.compile(r"([([{])'(?=\S)", flags=re.U),
-            # single closing
-            re.compile(r"(^|\S)'(?={0}|{1}|<|$)".format(
-                regex_snippets['space'], pnct_re_s), flags=re.U),
-            # single opening
-            re.compile(r"'", re.U),
-            # double opening following an open bracket. Allows things like
-            # Hello ["(Mum) & dad"]
-            re.compile(r'([([{])"(?=\S)', flags=re.U),
-            # double closing
-            re.compile(r'(^|\S)"(?={0}|{1}|<|$)'.format(
-                regex_snippets['space'], pnct_re_s), re.U),
-            # double opening
-            re.compile(r'"'),
-            # ellipsis
-            re.compile(r'([^.]?)\.{3}'),
-            # ampersand
-            re.compile(r'(\s?)&(\s)', re.U),
-            # em dash
-            re.compile(r'(\s?)--(\s?)'),
-            # en dash
-            re.compile(r' - '),
-            # dimension sign
-            re.compile(r'([0-9]+[\])]?[\'"]? ?)[x]( ?[\[(]?)'
-                r'(?=[+-]?{0}[0-9]*\.?[0-9]+)'.format(cur), flags=re.I | re.U),
-            # trademark
-            re.compile(r'(\b ?|{0}|^)[([]TM[])]'.format(regex_snippets['space']
-                ), flags=re.I | re.U),
-            # registered
-            re.compile(r'(\b ?|{0}|^)[([]R[])]'.format(regex_snippets['space']
-                ), flags=re.I | re.U),
-            # copyright
-            re.compile(r'(\b ?|{0}|^)[([]C[])]'.format(regex_snippets['space']
-                ), flags=re.I | re.U),
-            # 1/2
-            re.compile(r'[([]1\/2[])]'),
-            # 1/4
-            re.compile(r'[([]1\/4[])]'),
-            # 3/4
-            re.compile(r'[([]3\/4[])]'),
-            # degrees
-            re.compile(r'[([]o[])]'),
-            # plus/minus
-            re.compile(r'[([]\+\/-[])]'),
-            # 3+ uppercase acronym
-            re.compile(r'\b([{0}][{1}]{{2,}})\b(?:[(]([^)]*)[)])'.format(
-                regex_snippets['abr'], regex_snippets['acr']), flags=re.U),
-            # 3+ uppercase
-            re.compile(r'({space}|^|[>(;-])([{abr}]{{3,}})([{nab}]*)'
-                '(?={space}|{pnct}|<|$)(?=[^">]*?(<|$))'.format(**{ 'space':
-                    regex_snippets['space'], 'abr': regex_snippets['abr'],
-                    'nab': regex_snippets['nab'], 'pnct': pnct_re_s}), re.U),
-        ]
-        # These are the changes that need to be made for characters that occur
-        # at the beginning of the string.
-        self.glyph_search_initial = list(self.glyph_search)
-        # apostrophe's
-        self.glyph_search_initial[0] = re.compile(r"({0}|\))'({0})".format(
-            regex_snippets['wrd']), flags=re.U)
-        # single closing
-        self.glyph_search_initial[3] = re.compile(r"(\S)'(?={0}|{1}|$)".format(
-                regex_snippets['space'], pnct_re_s), re.U)
-        # double closing
-        self.glyph_search_initial[6] = re.compile(r'(\S)"(?={0}|{1}|<|$)'.format(
-                regex_snippets['space'], pnct_re_s), re.U)
+        glyph_search, glyph_search_initial, self.glyph_triggers = (
+                compiled_patterns(('glyphs',), _build_glyph_search))
+        self.glyph_search = list(glyph_search)
+        self.glyph_search_initial = list(glyph_search_initial)
+
+        glyph_replace = compiled_patterns(('glyph_replace', self.html_type,
+            tuple(sorted(self.glyph_definitions.items()))),
+            self._build_glyph_replace)
+        self.glyph_replace = list(glyph_replace)
+        self.glyph_replace[22] = self.glyph_replace[22].format(self.uid)
 
-        self.glyph_replace = [x.format(**self.glyph_definitions) for x in (
+        if self.restricted is True:
+            self.url_schemes = self.restricted_url_schemes
+        else:
+            self.url_schemes = self.unrestricted_url_schemes
+
+    def _build_glyph_replace(self):
+        """Build the replacement strings matching glyph_search.  The uid is
+        left as a format placeholder, as it differs between instances."""
+        glyph_replace = [x.format(**self.glyph_definitions) for x in (
             r'\1{apostrophe}\2',                  # apostrophe's
             r'\1{apostrophe}\2',                  # back in '88
             r'\1{quote_single_open}',             # single opening after bracket
@@ -200,17 +377,41 @@ class Textile(object):
             r'{degrees}',                         # degrees
             r'{plusminus}',                       # plus/minus
             r'<acronym title="\2">\1</acronym>',  # 3+ uppercase acronym
-            r'\1<span class="caps">{0}:glyph:\2'  # 3+ uppercase
-              r'</span>\3'.format(self.uid),
+            r'\1<span class="caps">{{0}}:glyph:\2'  # 3+ uppercase
+              r'</span>\3',
         )]
 
         if self.html_type == 'html5':
-            self.glyph_replace[21] = r'<abbr title="\2">\1</abbr>'
+            glyph_replace[21] = r'<abbr title="\2">\1</abbr>'
+        return tuple(glyph_replace)
 
-        if self.restricted is True:
-            self.url_schemes = self.restricted_url_schemes
-        else:
-            self.url_schemes = self.unrestricted_url_schemes
+    def _reset_state(self):
+        """Forget everything collected while parsing a document: footnotes,
+        link references, shelved text and list numbering."""
+        self.fn = {}
+        self.urlrefs = {}
+        self.shelf = []
+        self.span_depth = 0
+        self.linkIndex = 0
+        self.refCache = {}
+        self.refIndex = 0
+        self.note_index = type(self).note_index
+        self.image_sizes = {}
+        # the urls of the images whose sizes retrieveImageSizes fills in
+        self.sized_images = []
+        if hasattr(self, 'olstarts'):
+            del self.olstarts
+
+    def parse_many(self, texts, rel=None, sanitize=False):
+        """Parse each of the texts in turn and yield the html output.  The
+        per-document state is reset in between, so the results are the same as
+        parsing each text with a new Textile instance, but the instance's
+        compiled resources are reused."""
+        initial_rel = self.rel
+        for text in texts:
+            self._reset_state()
+            self.rel = initial_rel
+            yield self.parse(text, rel=rel, sanitize=sanitize)
 
     def parse(self, text, rel=None, sanitize=False):
         """Parse the input text as textile and return html output."""
@@ -221,21 +422,12 @@ class Textile(object):
         if text.strip() == '':
             return text
 
-        if self.restricted:
-            text = encode_html(text, quotes=False)
-
-        text = normalize_newlines(text)
-        text = text.replace(self.uid, '')
+        text = self._prepare_text(text)
 
         if self.block_tags:
-            if self.lite:
-                self.blocktag_whitelist = ['bq', 'p']
-                text = self.block(text)
-            else:
-                self.blocktag_whitelist = [ 'bq', 'p', 'bc', 'notextile',
-                        'pre', 'h[1-6]',
-                        'fn{0}+'.format(regex_snippets['digit']), '###']
-                text = self.block(text)
+            self._set_blocktag_whitelist()
+            text = self.block(text)
+            if not self.lite:
                 text = self.placeNoteLists(text)
         else:
             # Inline markup (em, strong, sup, sub, del etc).
@@ -248,24 +440,174 @@ class Textile(object):
         if rel:
             self.rel = ' rel="{0}"'.format(rel)
 
+        text = self._finish(text, sanitize)
+
+        text = text.rstrip('\n')
+
+        return text
+
+    def _prepare_text(self, text):
+        if self.restricted:
+            text = encode_html(text, quotes=False)
+        text = normalize_newlines(text)
+        return self._strip_uid(text)
+
+    async def parse_async(self, text, rel=None, sanitize=False,
+            executor=None):
+        """Parse the input text as textile and return html output, without
+        blocking the asyncio event loop.  Text of async_executor_threshold
+        characters or more is parsed in executor (the loop's default one if
+        it's None), and so is any text with get_sizes, since finding the
+        sizes of its images means waiting on their servers.  Each call parses
+        with the instance's settings but state of its own, as parse_many does
+        for each text, so calls can overlap; no more than async_concurrency
+        of them run at once."""
+        import asyncio
+        import copy
+
+        loop = asyncio.get_event_loop()
+        if getattr(self, '_async_loop', None) is not loop:
+            self._async_loop = loop
+            self._async_semaphore = asyncio.Semaphore(self.async_concurrency)
+
+        async with self._async_semaphore:
+            textile = copy.copy(self)
+            textile._reset_state()
+            if (len(text) < self.async_executor_threshold and
+                    not (self.get_sizes and not self.noimage)):
+                return textile.parse(text, rel=rel, sanitize=sanitize)
+            return await loop.run_in_executor(executor, lambda:
+                    textile.parse(text, rel=rel, sanitize=sanitize))
+
+    def parse_iter(self, chunks, rel=None, sanitize=False):
+        """Parse textile read from an iterable of strings, such as a file
+        object, and yield the html output block by block.
+
+        Only the block being rendered is held in memory, along with the state
+        which spans the whole document (footnotes, notes and link references).
+        A sanitized document is sanitized one block at a time.  Output which
+        links to a name that isn't a link reference yet, such as "x":hobix, is
+        held back, along with the output after it, until the reference (here
+        [hobix]http://hobix.com) is read or the text ends.  Once a notelist
+        is found, the rest of the output is held back until the end of the
+        text, when every note is known."""
+        self.notes = OrderedDict()
+        self.unreferencedNotes = OrderedDict()
+        self.notelist_cache = OrderedDict()
+
+        if isinstance(chunks, str):
+            chunks = [chunks]
+        if not self.block_tags:
+            # inline markup needs to see the whole text at once.
+            yield self.parse(''.join(chunks), rel=rel, sanitize=sanitize)
+            return
+
+        # text which is only whitespace is returned as it is.
+        leading = []
+        chunks = iter(chunks)
+        for chunk in chunks:
+            leading.append(chunk)
+            if chunk.strip():
+                break
+        else:
+            text = ''.join(leading)
+            if text:
+                yield text
+            return
+        chunks = itertools.chain(leading, chunks)
+
+        if self.restricted:
+            chunks = (encode_html(chunk, quotes=False) for chunk in chunks)
+        blocks = (self._strip_uid(block) for block in iter_blocks(chunks))
+        self._set_blocktag_whitelist()
+
+        # output is split up after the whitespace between blocks.  Newlines at
+        # the end of the output are stripped, so they're held back until we
+        # know more output follows.
+        # fragments are held in waiting while the first of them links to a
+        # reference which hasn't been defined yet.
+        fragment, waiting, held = [], [], []
+        newlines = ''
+
+        def finish(count):
+            nonlocal newlines
+            for text in waiting[:count]:
+                html = self._finish(text, sanitize, notelists=False)
+                self._forget_shelved(text)
+                if html.rstrip('\n'):
+                    yield '{0}{1}'.format(newlines, html.rstrip('\n'))
+                    newlines = ''
+                newlines = '{0}{1}'.format(newlines,
+                        html[len(html.rstrip('\n')):])
+            del waiting[:count]
+
+        lines = itertools.chain(self._iter_block(blocks), [None])
+        for line in lines:
+            if line is not None:
+                fragment.append(line)
+                if line.strip():
+                    continue
+            if not fragment:
+                continue
+            text = ''.join(fragment)
+            fragment = []
+            if held or (not self.lite and '<p>notelist' in text):
+                held.append(text)
+                continue
+            waiting.append(text)
+            ready = 0
+            while ready < len(waiting) and not self._links_to_undefined_refs(
+                    waiting[ready]):
+                ready = ready + 1
+            yield from finish(ready)
+        yield from finish(len(waiting))
+
+        if held:
+            text = self.placeNoteLists(''.join(held))
+            html = self._finish(text, sanitize).rstrip('\n')
+            if html:
+                yield '{0}{1}'.format(newlines, html)
+
+        if rel:
+            self.rel = ' rel="{0}"'.format(rel)
+
+    def render_stream(self, infile, outfile, rel=None, sanitize=False,
+            flush=False):
+        """Read textile from the file object infile and write the html to
+        outfile as each block is rendered.  With flush, outfile is flushed
+        after each block, so the output is seen as soon as it's ready."""
+        for html in self.parse_iter(infile, rel=rel, sanitize=sanitize):
+            outfile.write(html)
+            if flush:
+                outfile.flush()
+
+    def _set_blocktag_whitelist(self):
+        if self.lite:
+            self.blocktag_whitelist = ['bq', 'p']
+        else:
+            self.blocktag_whitelist = [ 'bq', 'p', 'bc', 'notextile', 'pre',
+                    'h[1-6]', 'fn{0}+'.format(regex_snippets['digit']), '###']
+
+    def _finish(self, text, sanitize=False, notelists=True):
+        """Apply the substitutions which follow block level processing: link
+        references, note lists, shelved text and urls, and break tags."""
         text = self.getRefs(text)
 
-        if not self.lite:
+        if notelists and not self.lite:
             text = self.placeNoteLists(text)
         text = self.retrieve(text)
+        text = self.retrieveImageSizes(text)
         text = text.replace('{0}:glyph:'.format(self.uid), '')
 
-        if sanitize:
-            text = sanitizer.sanitize(text)
-
+        # urls are put back first, so they're sanitized too
         text = self.retrieveURLs(text)
 
+        if sanitize:
+            text = sanitizer.sanitize(text, html5lib=sanitize == 'html5lib')
+
         # if the text contains a break tag (<br> or <br />) not followed by
         # a newline, replace it with a new style break tag and a newline.
         text = re.sub(r'<br( /)?>(?!\n)', '<br />\n', text)
-
-        text = text.rstrip('\n')
-
         return text
 
     def table(self, text):
@@ -398,23 +740,29 @@ class Textile(object):
                           re.S).sub(self.doBr, input)
 
     def doPBr(self, in_):
-        return re.compile(r'<(p)([^>]*?)>(.*)(</\1>)', re.S).sub(self.doBr,
-                                                                 in_)
+        return self._block_patterns()['p_br'].sub(self.doBr, in_)
 
     def doBr(self, match):
-        content = re.sub(r'(.+)(?:(?<!<br>)|(?<!<br />))\n(?![#*;:\s|])',
-                         r'\1<br />', match.group(3))
+        content = self._block_patterns()['br'].sub('<br />', match.group(3))
         return '<{0}{1}>{2}{3}'.format(match.group(1), match.group(2), content,
                 match.group(4))
 
+    def _block_patterns(self):
+        """Return the compiled block regexes for the current mode."""
+        btag = self.btag_lite if self.lite else self.btag
+        return compiled_patterns(('block', btag),
+                lambda: _build_block_patterns('|'.join(btag)))
+
     def block(self, text):
-        if not self.lite:
-            tre = '|'.join(self.btag)
-        else:
-            tre = '|'.join(self.btag_lite)
         # split the text by two or more newlines, retaining the newlines in the
         # split list
-        text = re.split(r'(\n{2,})', text)
+        text = self._block_patterns()['split'].split(text)
+        return ''.join(self._iter_block(text))
+
+    def _iter_block(self, text):
+        """Render the blocks and the whitespace between them, as split up by
+        block(), yielding the output as soon as it is final."""
+        patterns = self._block_patterns()
 
         # some blocks, when processed, will ask us to output nothing, if that's
         # the case, we'd want to drop the whitespace which follows it.
@@ -430,25 +778,37 @@ class Textile(object):
         atts = cite = ext = ''
 
         out = []
+        # whether any output has been yielded.  The items in out are revisited
+        # only while we're in an extended block, so everything else is yielded
+        # as soon as possible.  An extended block which outputs nothing can
+        # leave an item which was yielded as the last one, that's taken to be
+        # empty.
+        flushed = False
 
         for line in text:
+            while len(out) > (2 if ext else 0):
+                yield out.pop(0)
+                flushed = True
+
             # the line is just whitespace, add it to the output, and move on
             if not line.strip():
-                if not eat_whitespace:
+                if eat_whitespace:
+                    continue
+                if ext:
                     out.append(line)
+                else:
+                    yield line
+                    flushed = True
                 continue
 
             eat_whitespace = False
 
-            pattern = (r'^(?P<tag>{0})(?P<atts>{1}{2})\.(?P<ext>\.?)'
-                    r'(?::(?P<cite>\S+))? (?P<content>.*)$'.format(tre,
-                        align_re_s, cls_re_s))
-            match = re.search(pattern, line, flags=re.S | re.U)
+            match = patterns['tag'].search(line)
             # tag specified on this line.
             if match:
                 # if we had a previous extended tag but not this time, close up
                 # the tag
-                if ext and out:
+                if ext and len(out) > 1:
                     # it's out[-2] because the last element in out is the
                     # whitespace that preceded this line
                     if not escaped:
@@ -486,11 +846,11 @@ class Textile(object):
             else:
                 # if we're inside an extended block, add the text from the
                 # previous line to the front.
-                if ext and out:
+                if ext and (out or flushed):
                     if block.tag == 'p':
                         line = generate_tag(block.tag, line, block.outer_atts)
                         multiline_para = True
-                    line = '{0}{1}'.format(out.pop(), line)
+                    line = '{0}{1}'.format(out.pop() if out else '', line)
                 # the logic in the if statement below is a bit confusing in
                 # php-textile. I'm still not sure I understand what the php
                 # code is doing. Something tells me it's a phpsadness. Anyway,
@@ -530,7 +890,7 @@ class Textile(object):
             # if we're in an extended block, and we haven't specified a new
             # tag, join this line to the last item of the output
             if ext and not match:
-                last_item = out.pop()
+                last_item = out.pop() if out else ''
                 out.append('{0}{1}'.format(last_item, line))
             elif not block.eat:
                 # or if it's a type of block which indicates we shouldn't drop
@@ -555,7 +915,8 @@ class Textile(object):
             final = generate_tag(block.outer_tag, block.content,
                                  block.outer_atts)
             out.append(final)
-        return ''.join(out)
+        for line in out:
+            yield line
 
     def footnoteRef(self, text):
         # somehow php-textile gets away with not capturing the space.
@@ -595,16 +956,26 @@ class Textile(object):
         A similar situation occurs for double quotes as well.
         So, for the first pass, we use the glyph_search_initial set of
         regexes.  For all remaining passes, we use glyph_search
+        Each piece of text is scanned once for the characters the regexes
+        look for, and regexes whose characters don't occur are skipped.
         """
         text = text.rstrip('\n')
         result = []
         searchlist = self.glyph_search_initial
         # split the text by any angle-bracketed tags
-        for i, line in enumerate(re.compile(r'(<[\w\/!?].*?>)', re.U).split(
-            text)):
+        split_re = compiled_patterns(('glyph_split',), _build_glyph_split)
+        for i, line in enumerate(split_re.split(text)):
             if not i % 2:
+                present = set(line)
                 for s, r in zip(searchlist, self.glyph_replace):
-                    line = s.sub(r, line)
+                    triggers = self.glyph_triggers.get(s)
+                    if triggers is not None and present.isdisjoint(triggers):
+                        continue
+                    line, count = s.subn(r, line)
+                    # a replacement can introduce characters later regexes
+                    # look for, e.g. the quotes in an acronym's title.
+                    if count:
+                        present.update(r if isinstance(r, str) else line)
             result.append(line)
             if i == 0:
                 searchlist = self.glyph_search
@@ -623,25 +994,69 @@ class Textile(object):
         return ''
 
     def relURL(self, url):
+        from urllib.parse import urlparse
         scheme = urlparse(url)[0]
         if scheme and scheme not in self.url_schemes:
             return '#'
         return url
 
     def shelve(self, text):
-        self.refIndex = self.refIndex + 1
-        itemID = '{0}{1}:shelve'.format(self.uid, self.refIndex)
-        self.shelf[itemID] = text
-        return itemID
+        """Put text aside on the shelf, returning the token which stands in
+        for it until it's retrieved."""
+        self.shelf.append(text)
+        return '{0}{1}:s'.format(self.uid, len(self.shelf) - 1)
+
+    def _strip_uid(self, text):
+        """Remove the uid from the input text, so it can't contain anything
+        which looks like a token.  Removing it can bring the parts around an
+        occurrence together to form a new one, so repeat until there's none."""
+        while self.uid in text:
+            text = text.replace(self.uid, '')
+        return text
+
+    def _links_to_undefined_refs(self, text):
+        """Whether text links to a name which might be defined as a link
+        reference, but hasn't been yet, directly or through shelved items."""
+        pattern = re.compile(r'{0}([0-9]+):([su])'.format(re.escape(
+            self.uid)))
+        stack = [text]
+        while stack:
+            for m in pattern.finditer(stack.pop()):
+                index = int(m.group(1))
+                if m.group(2) == 'u':
+                    url = self.refCache.get(index, '')
+                    if url not in self.urlrefs and ref_name_re.match(url):
+                        return True
+                elif index < len(self.shelf) and self.shelf[index] is not None:
+                    stack.append(self.shelf[index])
+        return False
+
+    def _forget_shelved(self, text):
+        """Drop the shelved text and urls referenced by text, directly or
+        through other shelved items, once it has been output."""
+        pattern = re.compile(r'{0}([0-9]+):([su])'.format(re.escape(
+            self.uid)))
+        stack = [text]
+        while stack:
+            for m in pattern.finditer(stack.pop()):
+                index = int(m.group(1))
+                if m.group(2) == 'u':
+                    self.refCache.pop(index, None)
+                elif index < len(self.shelf) and self.shelf[index] is not None:
+                    stack.append(self.shelf[index])
+                    self.shelf[index] = None
 
     def retrieve(self, text):
-        while True:
-            old = text
-            for k, v in self.shelf.items():
-                text = text.replace(k, v)
-            if text == old:
-                break
-        return text
+        """Replace the shelved tokens in text with their content in a single
+        pass, resolving any tokens nested within that content as well."""
+        pattern = re.compile(r'{0}([0-9]+):s'.format(re.escape(self.uid)))
+        return pattern.sub(self.fRetrieve, text)
+
+    def fRetrieve(self, match):
+        index = int(match.group(1))
+        if index >= len(self.shelf) or self.shelf[index] is None:
+            return match.group()
+        return self.retrieve(self.shelf[index])
 
     def graf(self, text):
         if not self.lite:
@@ -681,103 +1096,95 @@ class Textile(object):
         # Slice text on '":<not space>' boundaries. These always occur in
         # inline links between the link text and the url part and are much more
         # infrequent than '"' characters so we have less possible links to
-        # process.
-        slice_re = re.compile(r'":(?={0})'.format(regex_snippets['char']))
-        slices = slice_re.split(text)
+        # process.  There are never any start of links after the last one.
+        slice_re, not_space_re = compiled_patterns(('link_start',),
+                _build_link_start_patterns)
+        not_space = not_space_re.match
+        marker = '{0}linkStartMarker:'.format(self.uid)
         output = []
+        # the end of the text already copied to output
+        done = 0
+        start = 0
+        for boundary in slice_re.finditer(text):
+            end, next_start = boundary.start(), boundary.end()
+            # The slice from start to end is cut into parts by its '"'
+            # characters.  Any of them could be the start of the link text -
+            # we have to find which one.  Start our search with the closest
+            # prior quote mark, and work back until the parts in between are
+            # balanced.  The part we're looking at runs from quote + 1 to
+            # part_end.
+            part_end = end
+            quote = text.rfind('"', start, end)
+            # If there is no possible start quote then this slice is not a
+            # link
+            if quote == -1:
+                start = next_start
+                continue
 
-        if len(slices) > 1:
-            # There are never any start of links in the last slice, so pop it
-            # off (we'll glue it back later).
-            last_slice = slices.pop()
-
-            for s in slices:
-                # If there is no possible start quote then this slice is not
-                # a link
-                if '"' not in s:
-                    output.append(s)
-                    continue
-                # Cut this slice into possible starting points wherever we find
-                # a '"' character. Any of these parts could represent the start
-                # of the link text - we have to find which one.
-                possible_start_quotes = s.split('"')
-
-                # Start our search for the start of the link with the closest
-                # prior quote mark.
-                possibility = possible_start_quotes.pop()
-
-                # Init the balanced count. If this is still zero at the end of
-                # our do loop we'll mark the " that caused it to balance as the
-                # start of the link and move on to the next slice.
-                balanced = 0
-                linkparts = []
-                i = 0
-
-                while balanced != 0 or i == 0: # pragma: no branch
-                    # Starting at the end, pop off the previous part of the
-                    # slice's fragments.
-
-                    # Add this part to those parts that make up the link text.
-                    linkparts.append(possibility)
-
-                    if len(possibility) > 0:
-                        # did this part inc or dec the balanced count?
-                        if re.search(r'^\S|=$', possibility, flags=re.U): # pragma: no branch
-                            balanced = balanced - 1
-                        if re.search(r'\S$', possibility, flags=re.U): # pragma: no branch
-                            balanced = balanced + 1
-                        try:
-                            possibility = possible_start_quotes.pop()
-                        except IndexError:
-                            break
+            # Init the balanced count. If this is zero once we've looked at a
+            # part we'll mark the " before it as the start of the link and
+            # move on to the next slice.
+            balanced = 0
+            empty_parts = 0
+            opening = ''
+            while True:
+                part_start = quote + 1 if quote != -1 else start
+                if part_end > part_start:
+                    # did this part inc or dec the balanced count?  As with
+                    # the regexes ^\S, =$ and \S$, the end of the part can be
+                    # before a newline which ends it.
+                    last = part_end - 1
+                    newline = text[last] == '\n' and last > part_start
+                    if (not_space(text, part_start) or text[last] == '=' or
+                            newline and text[last - 1] == '='):
+                        balanced = balanced - 1
+                    if (not_space(text, last) or
+                            newline and not_space(text, last - 1)):
+                        balanced = balanced + 1
+                    if quote == -1:
+                        # Out of parts: the whole slice is the link text, and
+                        # it's given an opening quote of its own.
+                        part_end = start
+                        opening = '"'
+                        break
+                    part_end = quote
+                    quote = text.rfind('"', start, part_end)
+                else:
+                    # If quotes occur next to each other, we get zero length
+                    # strings.  eg. ...""Open the door, HAL!"":url...  In
+                    # this case we count a zero length in the last position
+                    # as a closing quote and others as opening quotes.
+                    if empty_parts == 0:
+                        balanced = balanced + 1
                     else:
-                        # If quotes occur next to each other, we get zero
-                        # length strings.  eg. ...""Open the door,
-                        # HAL!"":url...  In this case we count a zero length in
-                        # the last position as a closing quote and others as
-                        # opening quotes.
-                        if i == 0:
-                            balanced = balanced + 1
-                        else:
-                            balanced = balanced - 1
-                        i = i + 1
-
-                        try:
-                            possibility = possible_start_quotes.pop()
-                        except IndexError: # pragma: no cover
-                            # If out of possible starting segments we back the
-                            # last one from the linkparts array
-                            linkparts.pop()
-                            break
-                        # If the next possibility is empty or ends in a space
-                        # we have a closing ".
-                        if (possibility == '' or possibility.endswith(' ')):
-                            # force search exit
-                            balanced = 0;
-
-                    if balanced <= 0:
-                        possible_start_quotes.append(possibility)
+                        balanced = balanced - 1
+                    empty_parts = empty_parts + 1
+                    if quote == -1: # pragma: no cover
+                        # Out of parts: the link starts at the first quote.
                         break
-
-                # Rebuild the link's text by reversing the parts and sticking
-                # them back together with quotes.
-                linkparts.reverse()
-                link_content = '"'.join(linkparts)
-                # Rebuild the remaining stuff that goes before the link but
-                # that's already in order.
-                pre_link = '"'.join(possible_start_quotes)
-                # Re-assemble the link starts with a specific marker for the
-                # next regex.
-                o = '{0}{1}linkStartMarker:"{2}'.format(pre_link, self.uid,
-                        link_content)
-                output.append(o)
-
-            # Add the last part back
-            output.append(last_slice)
-            # Re-assemble the full text with the start and end markers
-            text = '":'.join(output)
-
-        return text
+                    part_end = quote
+                    quote = text.rfind('"', start, part_end)
+                    # If the next part is empty or ends in a space we have a
+                    # closing ".
+                    if (part_end == (quote + 1 if quote != -1 else start) or
+                            text[part_end - 1] == ' '):
+                        # force search exit
+                        balanced = 0
+
+                if balanced <= 0:
+                    break
+
+            # Mark the quote at part_end as the start of the link.
+            output.append(text[done:part_end])
+            output.append(marker)
+            output.append(opening)
+            done = part_end
+            start = next_start
+
+        if not output:
+            return text
+        output.append(text[done:])
+        return ''.join(output)
 
     def replaceLinks(self, text):
         """Replaces links with tokens and stores them on the shelf."""
@@ -801,135 +1208,23 @@ class Textile(object):
         if inner == '':
             return '{0}"{1}":{2}'.format(pre, inner, url)
 
-        m = re.search(r'''^
-            (?P<atts>{0})                # $atts (if any)
-            {1}*                         # any optional spaces
-            (?P<text>                    # $text is...
-                (!.+!)                   #     an image
-            |                            #   else...
-                .+?                      #     link text
-            )                            # end of $text
-            (?:\((?P<title>[^)]+?)\))?   # $title (if any)
-            $'''.format(cls_re_s, regex_snippets['space']), inner,
-                flags=re.X | re.U)
+        m = compiled_patterns(('link_text',), _build_link_text_pattern).search(
+                inner)
 
         atts = (m and m.group('atts')) or ''
         text = (m and m.group('text')) or inner
         title = (m and m.group('title')) or ''
 
-        pop, tight = '', ''
-        counts = { '[': None, ']': url.count(']'), '(': None, ')': None }
-
-        # Look for footnotes or other square-bracket delimited stuff at the end
-        # of the url...
-        #
-        # eg. "text":url][otherstuff... will have "[otherstuff" popped back
-        # out.
-        #
-        # "text":url?q[]=x][123]    will have "[123]" popped off the back, the
-        # remaining closing square brackets will later be tested for balance
-        if (counts[']']):
-            m = re.search(r'(?P<url>^.*\])(?P<tight>\[.*?)$', url, flags=re.U)
-            if m:
-                url, tight = m.groups()
-
-        # Split off any trailing text that isn't part of an array assignment.
-        # eg. "text":...?q[]=value1&q[]=value2 ... is ok
-        # "text":...?q[]=value1]following  ... would have "following" popped
-        # back out and the remaining square bracket will later be tested for
-        # balance
-        if (counts[']']):
-            m = re.search(r'(?P<url>^.*\])(?!=)(?P<end>.*?)$', url, flags=re.U)
-            url = m.group('url')
-            tight = '{0}{1}'.format(m.group('end'), tight)
-
-        # Now we have the array of all the multi-byte chars in the url we will
-        # parse the  uri backwards and pop off  any chars that don't belong
-        # there (like . or , or unmatched brackets of various kinds).
-        first = True
-        popped = True
-
-        counts[']'] = url.count(']')
-        url_chars = list(url)
-
-        def _endchar(c, pop, popped, url_chars, counts, pre):
-            """Textile URL shouldn't end in these characters, we pop them off
-            the end and push them out the back of the url again."""
-            pop = '{0}{1}'.format(c, pop)
-            url_chars.pop()
-            popped = True
-            return pop, popped, url_chars, counts, pre
-
-        def _rightanglebracket(c, pop, popped, url_chars, counts, pre):
-            url_chars.pop()
-            urlLeft = ''.join(url_chars)
-
-            m = re.search(r'(?P<url_chars>.*)(?P<tag><\/[a-z]+)$', urlLeft)
-            url_chars = m.group('url_chars')
-            pop = '{0}{1}{2}'.format(m.group('tag'), c, pop)
-            popped = True
-            return pop, popped, url_chars, counts, pre
-
-        def _closingsquarebracket(c, pop, popped, url_chars, counts, pre):
-            """If we find a closing square bracket we are going to see if it is
-            balanced.  If it is balanced with matching opening bracket then it
-            is part of the URL else we spit it back out of the URL."""
-            # If counts['['] is None, count the occurrences of '['
-            counts['['] = counts['['] or url.count('[')
-
-            if counts['['] == counts[']']:
-                # It is balanced, so keep it
-                url_chars.append(c)
-            else:
-                # In the case of un-matched closing square brackets we just eat
-                # it
-                popped = True
-                url_chars.pop()
-                counts[']'] = counts[']'] - 1;
-                if first: # pragma: no branch
-                    pre = ''
-            return pop, popped, url_chars, counts, pre
-
-        def _closingparenthesis(c, pop, popped, url_chars, counts, pre):
-            if counts[')'] is None: # pragma: no branch
-                counts['('] = url.count('(')
-                counts[')'] = url.count(')')
-
-            if counts['('] != counts[')']:
-                # Unbalanced so spit it out the back end
-                popped = True
-                pop = '{0}{1}'.format(url_chars.pop(), pop)
-                counts[')'] = counts[')'] - 1
-            return pop, popped, url_chars, counts, pre
-
-        def _casesdefault(c, pop, popped, url_chars, counts, pre):
-            return pop, popped, url_chars, counts, pre
-
-        cases = {
-                '!': _endchar,
-                '?': _endchar,
-                ':': _endchar,
-                ';': _endchar,
-                '.': _endchar,
-                ',': _endchar,
-                '>': _rightanglebracket,
-                ']': _closingsquarebracket,
-                ')': _closingparenthesis,
-                }
-        for c in url_chars[-1::-1]: # pragma: no branch
-            popped = False
-            pop, popped, url_chars, counts, pre = cases.get(c,
-                    _casesdefault)(c, pop, popped, url_chars, counts, pre)
-            first = False
-            if popped is False:
-                break
+        url, pop, tight, eaten = trim_url(url)
+        # an unmatched ']' at the end of the url was eaten, so there's no
+        # closing bracket for pre any more.
+        if eaten:
+            pre = ''
 
-        url = ''.join(url_chars)
+        from urllib.parse import urlsplit, urlunsplit
         uri_parts = urlsplit(url)
 
-        scheme_in_list = uri_parts.scheme in self.url_schemes
-        valid_scheme = (uri_parts.scheme and scheme_in_list)
-        if not is_valid_url(url) and not valid_scheme:
+        if uri_parts.scheme and uri_parts.scheme not in self.url_schemes:
             return in_.replace('{0}linkStartMarker:'.format(self.uid), '')
 
         if text == '$':
@@ -971,20 +1266,19 @@ class Textile(object):
         Fixed version of the following code fragment from Stack Overflow:
             http://stackoverflow.com/a/804380/72656
         """
+        from urllib.parse import quote, unquote, urlsplit, urlunsplit
+
         # parse it
         parsed = urlsplit(url)
+        netloc_re, unreserved_path_re = compiled_patterns(('encode_url',),
+                _build_url_patterns)
 
-        if parsed.netloc:
+        if '@' in parsed.netloc or ':' in parsed.netloc:
             # divide the netloc further
-            netloc_pattern = re.compile(r"""
-                (?:(?P<user>[^:@]+)(?::(?P<password>[^:@]+))?@)?
-                (?P<host>[^:]+)
-                (?::(?P<port>[0-9]+))?
-            """, re.X | re.U)
-            netloc_parsed = netloc_pattern.match(parsed.netloc).groupdict()
+            netloc_parsed = netloc_re.match(parsed.netloc).groupdict()
         else:
-            netloc_parsed = {'user': '', 'password': '', 'host': '', 'port':
-                    ''}
+            netloc_parsed = {'user': '', 'password': '', 'host':
+                    parsed.netloc, 'port': ''}
 
         # encode each component
         scheme = parsed.scheme
@@ -999,9 +1293,11 @@ class Textile(object):
         # slashes, and this is a way to clean that up. It branches for PY2/3
         # because the quote and unquote functions expects different input
         # types: unicode strings for PY2 and str for PY3.
-        path_parts = (quote(unquote(pce), b'') for pce in
-                parsed.path.split('/'))
-        path = '/'.join(path_parts)
+        # A path which has nothing to encode is left as it is.
+        path = parsed.path
+        if not unreserved_path_re.match(path):
+            path_parts = (quote(unquote(pce), b'') for pce in path.split('/'))
+            path = '/'.join(path_parts)
 
         # put it back together
         netloc = ''
@@ -1016,46 +1312,24 @@ class Textile(object):
         return urlunsplit((scheme, netloc, path, parsed.query, parsed.fragment))
 
     def span(self, text):
-        qtags = (r'\*\*', r'\*', r'\?\?', r'\-', r'__',
-                 r'_', r'%', r'\+', r'~', r'\^')
-        pnct = r""".,"'?!;:‹›«»„“”‚‘’"""
         self.span_depth = self.span_depth + 1
 
         if self.span_depth <= self.max_span_depth:
-            for tag in qtags:
-                pattern = re.compile(r"""
-                    (?P<pre>^|(?<=[\s>{pnct}\(])|[{{[])
-                    (?P<tag>{tag})(?!{tag})
-                    (?P<atts>{cls})
-                    (?!{tag})
-                    (?::(?P<cite>\S+[^{tag}]{space}))?
-                    (?P<content>[^{space}{tag}]+|\S.*?[^\s{tag}\n])
-                    (?P<end>[{pnct}]*)
-                    {tag}
-                    (?P<tail>$|[\[\]}}<]|(?=[{pnct}]{{1,2}}[^0-9]|\s|\)))
-                """.format(**{'tag': tag, 'cls': cls_re_s, 'pnct': pnct,
-                    'space': regex_snippets['space']}), flags=re.X | re.U)
-                text = pattern.sub(self.fSpan, text)
+            for delimiter, pattern in compiled_patterns(('span',),
+                    _build_span_patterns):
+                # A span needs both an opening and a closing delimiter, so
+                # skip the pass unless the delimiter occurs at least twice.
+                # Earlier passes may add delimiters through attributes, so
+                # the count is taken against the current text.
+                if text.count(delimiter) > 1:
+                    text = pattern.sub(self.fSpan, text)
         self.span_depth = self.span_depth - 1
         return text
 
     def fSpan(self, match):
         pre, tag, atts, cite, content, end, tail = match.groups()
 
-        qtags = {
-            '*':  'strong',
-            '**': 'b',
-            '??': 'cite',
-            '_':  'em',
-            '__': 'i',
-            '-':  'del',
-            '%':  'span',
-            '+':  'ins',
-            '~':  'sub',
-            '^':  'sup'
-        }
-
-        tag = qtags[tag]
+        tag = self.span_tags[tag]
         atts = pba(atts, restricted=self.restricted)
         if cite:
             atts = '{0} cite="{1}"'.format(atts, cite.rstrip())
@@ -1068,21 +1342,37 @@ class Textile(object):
         return out
 
     def image(self, text):
-        pattern = re.compile(r"""
-            (?:[\[{{])?         # pre
-            \!                  # opening !
-            (\<|\=|\>)?         # optional alignment atts
-            ({0})               # optional style,class atts
-            (?:\.\s)?           # optional dot-space
-            ([^\s(!]+)          # presume this is the src
-            \s?                 # optional space
-            (?:\(([^\)]+)\))?   # optional title
-            \!                  # closing
-            (?::(\S+))?         # optional href
-            (?:[\]}}]|(?=\s|$)) # lookahead: space or end of string
-        """.format(cls_re_s), re.U | re.X)
+        pattern = compiled_patterns(('image',), _build_image_pattern)
         return pattern.sub(self.fImage, text)
 
+    def fetch_image_sizes(self, urls):
+        """Add the sizes of the images at urls to image_sizes."""
+        urls = [url for url in urls if url not in self.image_sizes]
+        if urls:
+            self.image_sizes.update(imagesize.getimagesizes(urls,
+                timeout=self.image_size_timeout,
+                workers=self.image_size_workers,
+                cache=imagesize.shared_size_cache()))
+
+    def retrieveImageSizes(self, text):
+        """Fetch the sizes of the images rendered so far, all at once, and
+        put them in place of the tokens fImage left for them.  Only the
+        images which are actually rendered are fetched: not those in code or
+        notextile."""
+        if not self.sized_images:
+            return text
+        self.fetch_image_sizes(self.sized_images)
+        pattern = re.compile(r' (height|width)="{0}([0-9]+):[hw]"'.format(
+            re.escape(self.uid)))
+
+        def fSize(match):
+            size = self.image_sizes.get(self.sized_images[int(match.group(2))])
+            if not size:
+                return ''
+            return ' {0}="{1}"'.format(match.group(1),
+                    size[1] if match.group(1) == 'height' else size[0])
+        return pattern.sub(fSize, text)
+
     def fImage(self, match):
         # (None, '', '/imgs/myphoto.jpg', None, None)
         align, attributes, url, title, href = match.groups()
@@ -1095,7 +1385,13 @@ class Textile(object):
             title = ''
 
         if not is_rel_url(url) and self.get_sizes:
-            size = imagesize.getimagesize(url)
+            size = self.image_sizes.get(url)
+            if size is None:
+                # tokens stand in for the size until retrieveImageSizes fills
+                # it in, so every image's size can be fetched at once
+                self.sized_images.append(url)
+                token = '{0}{1}:'.format(self.uid, len(self.sized_images) - 1)
+                size = ('{0}w'.format(token), '{0}h'.format(token))
 
         if href:
             href = self.shelveURL(href)
@@ -1390,11 +1686,13 @@ class Textile(object):
             return ''
         self.refIndex = self.refIndex + 1
         self.refCache[self.refIndex] = text
-        output = '{0}{1}{2}'.format(self.uid, self.refIndex, ':url')
+        output = '{0}{1}:u'.format(self.uid, self.refIndex)
         return output
 
     def retrieveURLs(self, text):
-        return re.sub(r'{0}(?P<token>[0-9]+):url'.format(self.uid), self.retrieveURL, text)
+        pattern = re.compile(r'{0}(?P<token>[0-9]+):u'.format(
+            re.escape(self.uid)))
+        return pattern.sub(self.retrieveURL, text)
 
     def retrieveURL(self, match):
         url = self.refCache.get(int(match.group('token')), '')
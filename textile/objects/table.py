@@ -1,8 +1,6 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
-from xml.etree import ElementTree
-
 from textile.regex_strings import (align_re_s, cls_re_s, regex_snippets,
         table_span_re_s, valign_re_s)
 from textile.utils import encode_html, generate_tag, parse_attributes
@@ -155,6 +153,7 @@ class Colgroup(object):
         self.restricted = restricted
 
     def process(self):
+        from xml.etree import ElementTree
         enc = 'unicode'
 
         group_atts = parse_attributes(self.attributes, 'col', restricted=self.restricted)
@@ -0,0 +1,69 @@
+from __future__ import unicode_literals
+
+import itertools
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from .core import Textile
+from .textilefactory import TextileFactory
+
+
+def _process_chunk(class_parms, method_parms, texts):
+    """Render a chunk of texts in a worker process."""
+    return list(Textile(**class_parms).parse_many(texts, **method_parms))
+
+
+def _chunks(texts, size):
+    texts = iter(texts)
+    while True:
+        chunk = list(itertools.islice(texts, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class ParallelTextileFactory(TextileFactory):
+    """A TextileFactory which spreads the work of process_many across a pool
+    of worker processes.  Texts are sent to the workers in chunks of chunksize
+    documents to keep the pickling overhead down, and the results are yielded
+    in the same order as the input.  workers defaults to the number of CPUs.
+    A cache, if one is given, is only used by process.
+    """
+
+    def __init__(self, workers=None, chunksize=100, **kwargs):
+        super(ParallelTextileFactory, self).__init__(**kwargs)
+        if chunksize < 1:
+            raise ValueError("chunksize must be at least 1")
+        self.workers = workers
+        self.chunksize = chunksize
+
+    def process_many(self, texts):
+        workers = self.workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Only keep a couple of chunks per worker in flight, so that a
+            # large input isn't read (and held in memory) all at once.
+            limit = 2 * workers
+            pending = deque()
+            try:
+                for chunk in _chunks(texts, self.chunksize):
+                    pending.append(executor.submit(_process_chunk,
+                        self.class_parms, self.method_parms, chunk))
+                    if len(pending) >= limit:
+                        for result in pending.popleft().result():
+                            yield result
+                while pending:
+                    for result in pending.popleft().result():
+                        yield result
+            finally:
+                for future in pending:
+                    future.cancel()
+
+
+def textile_many(texts, workers=None, chunksize=100, **kwargs):
+    """Render each of the texts in a pool of worker processes, yielding the
+    html output in order.  Any other keyword arguments are passed on to
+    TextileFactory."""
+    factory = ParallelTextileFactory(workers=workers, chunksize=chunksize,
+            **kwargs)
+    return factory.process_many(texts)
@@ -1,9 +1,78 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import sys
+import unicodedata
+
+
+def char_ranges(test):
+    """Find the code points for which test(char) is true, as a list of
+    (first, last) pairs."""
+    ranges, start = [], None
+    for c in range(sys.maxunicode + 1):
+        if test(chr(c)):
+            if start is None:
+                start = c
+        elif start is not None:
+            ranges.append((start, c - 1))
+            start = None
+    if start is not None:
+        ranges.append((start, sys.maxunicode))
+    return ranges
+
+
+def char_class(ranges):
+    """Write the (first, last) code point pairs as the contents of a regex
+    character class."""
+    def char(c):
+        c = chr(c)
+        return '\\' + c if c in '\\]^-' else c
+    return ''.join(char(first) if first == last else
+            '{0}-{1}'.format(char(first), char(last))
+            for first, last in ranges)
+
+
+def code_point_ranges(code_points):
+    """Group the code points into a list of (first, last) pairs."""
+    ranges = []
+    for c in sorted(code_points):
+        if ranges and ranges[-1][1] == c - 1:
+            ranges[-1] = (ranges[-1][0], c)
+        else:
+            ranges.append((c, c))
+    return ranges
+
+
+_uppercase_chars = None
+
+
+def uppercase_chars():
+    """The contents of a character class matching the uppercase characters.
+    Working them out takes a while, so they're taken from the tables in
+    textile._unicode_tables when there's one for this python's version of
+    the unicode database."""
+    global _uppercase_chars
+    if _uppercase_chars is None:
+        from textile import _unicode_tables
+        version = unicodedata.unidata_version
+        if version == _unicode_tables.unidata_version:
+            ranges = _unicode_tables.uppercase
+        elif version in _unicode_tables.uppercase_added:
+            added = set(c for first, last in
+                    _unicode_tables.uppercase_added[version]
+                    for c in range(first, last + 1))
+            ranges = code_point_ranges(c for first, last in
+                    _unicode_tables.uppercase
+                    for c in range(first, last + 1) if c not in added)
+        else:
+            ranges = char_ranges(str.isupper)
+        _uppercase_chars = char_class(ranges)
+    return _uppercase_chars
+
+
 try:
     # Use regex module for matching uppercase characters if installed,
-    # otherwise fall back to finding all the uppercase chars in a loop.
+    # otherwise fall back to a character class of all the uppercase chars.
     import regex as re
     upper_re_s = r'\p{Lu}'
     regex_snippets = {
@@ -17,13 +86,10 @@ try:
         'char': r'(?:[^\p{Zs}\v])',
         }
 except ImportError:
-    from sys import maxunicode
-    upper_re_s = "".join(
-                [chr(c) for c in range(maxunicode) if chr(c).isupper()]
-            )
+    upper_re_s = uppercase_chars()
     regex_snippets = {
         'acr': r'{0}0-9'.format(upper_re_s),
-        'abr': r'{0}'.format(upper_re_s),
+        'abr': upper_re_s,
         'nab': r'a-z',
         'wrd': r'\w',
         'cur': r'',
@@ -32,6 +98,7 @@ except ImportError:
         'char': r'\S',
         }
 
+
 halign_re_s = r'(?:\<(?!>)|(?<!<)\>|\<\>|\=|[()]+(?! ))'
 valign_re_s = r'[\-^~]'
 class_re_s = r'(?:\([^)\n]+\))'       # Don't allow classes/ids,
@@ -4,10 +4,13 @@ from .core import Textile
 
 class TextileFactory(object):
     """ Use TextileFactory to create a Textile object which can be re-used to
-    process multiple strings with the same settings."""
+    process multiple strings with the same settings.
+
+    cache can be a textile.cache.RenderCache, such as an LRUCache, in which
+    the processed html is kept, so the same text isn't processed again."""
 
     def __init__(self, restricted=False, lite=False, sanitize=False,
-                 noimage=None, get_sizes=False, html_type='xhtml'):
+                 noimage=None, get_sizes=False, html_type='xhtml', cache=None):
 
         self.class_parms = {}
         self.method_parms = {}
@@ -35,5 +38,26 @@ class TextileFactory(object):
         else:
             self.class_parms['html_type'] = html_type
 
+        self.cache = cache
+
+    def cache_key(self, text):
+        """The key under which the html for text is cached."""
+        from .cache import cache_key
+        return cache_key(text, dict(self.class_parms, **self.method_parms))
+
     def process(self, text):
-        return Textile(**self.class_parms).parse(text, **self.method_parms)
+        if self.cache is None:
+            return Textile(**self.class_parms).parse(text,
+                    **self.method_parms)
+        return self.cache.fetch(self.cache_key(text), lambda: Textile(
+            **self.class_parms).parse(text, **self.method_parms))
+
+    def process_many(self, texts):
+        """Process each of the texts with a single Textile object, yielding
+        the html output for each in turn."""
+        textile = Textile(**self.class_parms)
+        if self.cache is None:
+            return textile.parse_many(texts, **self.method_parms)
+        return (self.cache.fetch(self.cache_key(text), lambda: next(
+            textile.parse_many([text], **self.method_parms)))
+            for text in texts)
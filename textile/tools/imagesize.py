@@ -1,27 +1,422 @@
-def getimagesize(url):
+import re
+import time
+from collections import OrderedDict
+
+# the number of bytes asked for at a time.  Most headers are well within the
+# first, and further ones are only read when they aren't.
+CHUNK_SIZE = 2048
+
+# how far into an svg file its root element is looked for
+SVG_LIMIT = 65536
+
+svg_tag_re = re.compile(br'<svg\b[^>]*>')
+svg_attribute_re = re.compile(br'''\s(width|height|viewBox)\s*=\s*(["'])(.*?)\2''')
+svg_length_re = re.compile(br'\s*([0-9]*\.?[0-9]+)\s*(px)?\s*$')
+
+
+class _Source(object):
+    """The bytes of an image, fetched as they're read.  Subclasses fetch them
+    with _fetch(start, size), which returns at least size bytes from start
+    unless the image ends first."""
+
+    def __init__(self):
+        self.buffer = b''
+        # where buffer starts in the image
+        self.offset = 0
+
+    def _fill(self, n):
+        while len(self.buffer) < n:
+            data = self._fetch(self.offset + len(self.buffer),
+                    max(n - len(self.buffer), CHUNK_SIZE))
+            if not data:
+                break
+            self.buffer += data
+
+    def head(self, n):
+        """Return up to the next n bytes, without reading past them."""
+        self._fill(n)
+        return self.buffer[:n]
+
+    def read(self, n):
+        """Read the next n bytes, raising EOFError if there aren't that
+        many."""
+        self._fill(n)
+        if len(self.buffer) < n:
+            raise EOFError
+        data, self.buffer = self.buffer[:n], self.buffer[n:]
+        self.offset += n
+        return data
+
+    def skip(self, n):
+        """Skip the next n bytes, without fetching them if they haven't been
+        already."""
+        if n > len(self.buffer):
+            self.offset += n
+            self.buffer = b''
+        else:
+            self.read(n)
+
+    def close(self):
+        pass
+
+
+class _FileSource(_Source):
+    def __init__(self, f):
+        super(_FileSource, self).__init__()
+        self.f = f
+        self.position = 0
+
+    def _fetch(self, start, size):
+        if start > self.position:
+            try:
+                self.f.seek(start - self.position, 1)
+            except (AttributeError, OSError, ValueError):
+                while self.position < start:
+                    data = self.f.read(min(start - self.position, 65536))
+                    if not data:
+                        return b''
+                    self.position += len(data)
+            self.position = start
+        data = self.f.read(size)
+        self.position += len(data)
+        return data
+
+
+class _HTTPSource(_Source):
+    """Fetches the image with range requests.  If the server ignores them,
+    the whole image is read as it's sent, and the connection closed as soon
+    as the size is found."""
+
+    def __init__(self, url, timeout=None):
+        super(_HTTPSource, self).__init__()
+        self.url = url
+        self.timeout = timeout
+        self.response = None
+        # where the response is up to in the image, whether it's a range, and
+        # the length of the image if the server said
+        self.position = 0
+        self.ranged = False
+        self.length = None
+
+    def _open(self, start, size):
+        from urllib.error import HTTPError
+        from urllib.request import Request, urlopen
+
+        self.close()
+        request = Request(self.url, headers={
+            'Range': 'bytes={0}-{1}'.format(start, start + size - 1)})
+        try:
+            if self.timeout is None:
+                self.response = urlopen(request)
+            else:
+                self.response = urlopen(request, timeout=self.timeout)
+        except HTTPError as e:
+            # asked for a range past the end
+            if e.code == 416:
+                e.close()
+                self.length = start
+                return
+            raise
+        self.ranged = self.response.getcode() == 206
+        self.position = start if self.ranged else 0
+        if self.ranged:
+            total = self.response.headers.get('Content-Range', '')
+            total = total.rpartition('/')[2]
+            if total.isdigit():
+                self.length = int(total)
+
+    def _fetch(self, start, size):
+        if self.length is not None and start >= self.length:
+            return b''
+        if self.response is None or (self.ranged and start != self.position):
+            self._open(start, size)
+            if self.response is None:
+                return b''
+        while self.position < start:
+            data = self.response.read(min(start - self.position, 65536))
+            if not data:
+                return b''
+            self.position += len(data)
+        data = self.response.read(size)
+        if not data and self.ranged:
+            # the range is used up, but the image isn't
+            self._open(start, size)
+            if self.response is None:
+                return b''
+            data = self.response.read(size)
+        self.position += len(data)
+        return data
+
+    def close(self):
+        if self.response is not None:
+            self.response.close()
+            self.response = None
+
+
+def _png_size(source):
+    source.skip(8)
+    while True:
+        length = int.from_bytes(source.read(4), 'big')
+        kind = source.read(4)
+        if kind == b'IHDR':
+            data = source.read(8)
+            return (int.from_bytes(data[:4], 'big'),
+                    int.from_bytes(data[4:], 'big'))
+        # Apple's optimised pngs have a CgBI chunk first
+        if kind != b'CgBI':
+            return None
+        source.skip(length + 4)
+
+
+def _gif_size(source):
+    data = source.read(10)
+    return (int.from_bytes(data[6:8], 'little'),
+            int.from_bytes(data[8:10], 'little'))
+
+
+# the start of frame markers, which have the size in them, unlike the DHT,
+# JPG and DAC markers among them
+jpeg_sof_markers = frozenset(range(0xc0, 0xd0)) - {0xc4, 0xc8, 0xcc}
+
+
+def _jpeg_size(source):
+    source.skip(2)
+    while True:
+        if source.read(1) != b'\xff':
+            return None
+        marker = source.read(1)[0]
+        while marker == 0xff:
+            marker = source.read(1)[0]
+        # markers without a segment
+        if marker in (0x01, 0xd8) or 0xd0 <= marker <= 0xd7:
+            continue
+        # the image data, or its end, before a frame
+        if marker in (0xd9, 0xda):
+            return None
+        length = int.from_bytes(source.read(2), 'big')
+        if marker in jpeg_sof_markers:
+            data = source.read(5)
+            return (int.from_bytes(data[3:5], 'big'),
+                    int.from_bytes(data[1:3], 'big'))
+        source.skip(length - 2)
+
+
+def _webp_size(source):
+    source.skip(12)
+    kind = source.read(4)
+    source.skip(4)
+    if kind == b'VP8 ':
+        data = source.read(10)
+        return (int.from_bytes(data[6:8], 'little') & 0x3fff,
+                int.from_bytes(data[8:10], 'little') & 0x3fff)
+    if kind == b'VP8L':
+        bits = int.from_bytes(source.read(5)[1:], 'little')
+        return ((bits & 0x3fff) + 1, ((bits >> 14) & 0x3fff) + 1)
+    if kind == b'VP8X':
+        data = source.read(10)
+        return (int.from_bytes(data[4:7], 'little') + 1,
+                int.from_bytes(data[7:10], 'little') + 1)
+    return None
+
+
+def _svg_size(source):
+    size = CHUNK_SIZE
+    while True:
+        text = source.head(size)
+        m = svg_tag_re.search(text)
+        if m:
+            break
+        if len(text) < size or size >= SVG_LIMIT:
+            return None
+        size *= 4
+    atts = dict((name, value) for name, _, value in
+            svg_attribute_re.findall(m.group()))
+    lengths = []
+    for name in (b'width', b'height'):
+        length = svg_length_re.match(atts.get(name, b''))
+        # percentages and other units depend on where it's shown
+        lengths.append(float(length.group(1)) if length else None)
+    width, height = lengths
+    view_box = atts.get(b'viewBox', b'').replace(b',', b' ').split()
+    if (width is None or height is None) and len(view_box) == 4:
+        try:
+            box_width, box_height = float(view_box[2]), float(view_box[3])
+        except ValueError:
+            box_width = box_height = 0
+        if box_width > 0 and box_height > 0:
+            if width is None and height is None:
+                width, height = box_width, box_height
+            elif width is None:
+                width = height * box_width / box_height
+            else:
+                height = width * box_height / box_width
+    if width is None or height is None:
+        return None
+    return (int(round(width)), int(round(height)))
+
+
+def _sniff(source):
+    head = source.head(32)
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return _png_size(source)
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return _gif_size(source)
+    if head.startswith(b'\xff\xd8'):
+        return _jpeg_size(source)
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return _webp_size(source)
+    if head.lstrip(b'\xef\xbb\xbf \t\r\n').startswith(b'<'):
+        return _svg_size(source)
+    return None
+
+
+def _read_size(source):
+    from http.client import HTTPException
+
+    try:
+        return _sniff(source) or ''
+    except (EOFError, HTTPException, OSError, ValueError):
+        return ''
+    finally:
+        source.close()
+
+
+def sniffimagesize(f):
+    """
+    Returns the (width, height) of the image in the binary file f, in
+    pixels, or an empty string if it isn't a PNG, GIF, JPEG, WebP or SVG
+    image.  Only its header is read.
+
+    """
+    return _read_size(_FileSource(f))
+
+
+def getimagesize(url, timeout=None, allow_local=False):
     """
     Attempts to determine an image's width and height, and returns a tuple,
-    (width, height), in pixels or an empty string in case of failure.
-    Requires that PIL is installed.
+    (width, height), in pixels or an empty string in case of failure.  url
+    is an http(s) url, or with allow_local, a file url or the path of a
+    local file.  Local files are never read otherwise, since the urls Textile
+    fetches come from the text it's given.  Only the image's header is
+    fetched, using range requests where the server allows them.  timeout is
+    the number of seconds to wait for the server, if it's given.
 
     """
+    from urllib.parse import unquote, urlsplit
+    from urllib.request import url2pathname
 
-    try:
-        from PIL import ImageFile
-    except ImportError:
-        return ''
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme in ('http', 'https'):
+        return _read_size(_HTTPSource(url, timeout))
+    # a path, perhaps with a windows drive letter
+    if allow_local and (scheme == 'file' or len(scheme) < 2):
+        path = url2pathname(unquote(parts.path)) if scheme == 'file' else url
+        try:
+            f = open(path, 'rb')
+        except (OSError, ValueError):
+            return ''
+        with f:
+            return sniffimagesize(f)
+    return ''
 
-    from urllib.request import urlopen
 
-    try:
-        p = ImageFile.Parser()
-        f = urlopen(url)
-        while True:
-            s = f.read(1024)
-            if not s:
-                break
-            p.feed(s)
-            if p.image:
-                return p.image.size
-    except (IOError, ValueError):
-        return ''
+class SizeCache(object):
+    """A cache of the sizes found by getimagesize, keyed by url.  It holds
+    at most maxsize of them, dropping the least recently used first, and each
+    one for ttl seconds.  Failures are cached too, so a missing image isn't
+    fetched again on every parse.  It's safe to share between threads."""
+
+    def __init__(self, maxsize=1024, ttl=3600):
+        # imported here to keep import textile fast
+        import threading
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, url, default=None):
+        """Return the size cached for url, or default if there isn't one or
+        it has expired."""
+        with self._lock:
+            try:
+                expires, size = self._items[url]
+            except KeyError:
+                return default
+            if expires <= time.monotonic():
+                del self._items[url]
+                return default
+            self._items.move_to_end(url)
+            return size
+
+    def set(self, url, size):
+        with self._lock:
+            self._items.pop(url, None)
+            self._items[url] = (time.monotonic() + self.ttl, size)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+# the sizes found by every Textile instance, kept between parses.  It's made
+# by shared_size_cache when it's first needed.
+size_cache = None
+
+
+def shared_size_cache():
+    """Return size_cache, making it first if need be."""
+    global size_cache
+    if size_cache is None:
+        size_cache = SizeCache()
+    return size_cache
+
+
+def _lookup(urls, cache):
+    """Return the sizes of the urls found in cache, and a list of the rest,
+    without duplicates."""
+    absent = object()
+    sizes = {}
+    missing = []
+    for url in OrderedDict.fromkeys(urls):
+        size = absent if cache is None else cache.get(url, absent)
+        if size is absent:
+            missing.append(url)
+        else:
+            sizes[url] = size
+    return sizes, missing
+
+
+def _store(sizes, missing, found, cache):
+    for url, size in zip(missing, found):
+        sizes[url] = size
+        if cache is not None:
+            cache.set(url, size)
+    return sizes
+
+
+def getimagesizes(urls, timeout=None, workers=8, cache=None,
+        fetch=getimagesize):
+    """Find the sizes of the images at urls, as getimagesize does, fetching
+    up to workers of them at once.  Returns a dict mapping each url to its
+    size.  If a SizeCache is given, sizes are looked up in it first, and the
+    ones fetched are added to it."""
+    sizes, missing = _lookup(urls, cache)
+    if not missing:
+        return sizes
+
+    if len(missing) == 1 or workers <= 1:
+        found = [fetch(url, timeout) for url in missing]
+    else:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=min(workers, len(missing))) as pool:
+            found = list(pool.map(lambda url: fetch(url, timeout), missing))
+    return _store(sizes, missing, found, cache)
+
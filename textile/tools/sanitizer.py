@@ -1,11 +1,284 @@
-def sanitize(string):
+import bisect
+import re
+
+from textile.utils import encode_html, escape_attribute, html_void_tags
+
+# The tags Textile produces, and the attributes it gives each of them besides
+# the ones in global_attributes.  Anything else is escaped, so it shows up as
+# text, as html5lib's sanitizer does.
+allowed_tags = {
+    'a': frozenset(['href', 'rel']),
+    'abbr': frozenset(),
+    'acronym': frozenset(),
+    'b': frozenset(),
+    'blockquote': frozenset(['cite']),
+    'br': frozenset(),
+    'caption': frozenset(),
+    'cite': frozenset(),
+    'code': frozenset(),
+    'col': frozenset(['span', 'width']),
+    'colgroup': frozenset(['span', 'width']),
+    'dd': frozenset(),
+    'del': frozenset(['cite']),
+    'div': frozenset(),
+    'dl': frozenset(),
+    'dt': frozenset(),
+    'em': frozenset(),
+    'h1': frozenset(),
+    'h2': frozenset(),
+    'h3': frozenset(),
+    'h4': frozenset(),
+    'h5': frozenset(),
+    'h6': frozenset(),
+    'i': frozenset(),
+    'img': frozenset(['align', 'alt', 'height', 'src', 'width']),
+    'ins': frozenset(['cite']),
+    'li': frozenset(),
+    'ol': frozenset(['start']),
+    'p': frozenset(),
+    'pre': frozenset(),
+    'span': frozenset(),
+    'strong': frozenset(),
+    'sub': frozenset(),
+    'sup': frozenset(),
+    'table': frozenset(['summary']),
+    'tbody': frozenset(),
+    'td': frozenset(['colspan', 'rowspan']),
+    'tfoot': frozenset(),
+    'th': frozenset(['colspan', 'rowspan']),
+    'thead': frozenset(),
+    'tr': frozenset(),
+    'ul': frozenset(),
+}
+
+global_attributes = frozenset(['class', 'id', 'lang', 'style', 'title'])
+
+# attributes holding a url, which is dropped unless it's relative or has one
+# of these schemes, or is a data url of one of allowed_data_types
+url_attributes = frozenset(['cite', 'href', 'src'])
+allowed_url_schemes = frozenset(['callto', 'ftp', 'http', 'https', 'mailto',
+    'sftp', 'tel'])
+allowed_data_types = frozenset(['image/bmp', 'image/gif', 'image/jpeg',
+    'image/png', 'image/webp'])
+
+# css properties allowed in a style attribute.  Those starting background,
+# border, margin or padding are allowed too, when their values are made up
+# of colours, lengths and allowed_css_keywords.
+allowed_css_properties = frozenset(['background-color', 'border-collapse',
+    'clear', 'color', 'direction', 'display', 'float', 'font', 'font-family',
+    'font-size', 'font-style', 'font-variant', 'font-weight', 'height',
+    'letter-spacing', 'line-height', 'list-style-type', 'overflow',
+    'text-align', 'text-decoration', 'text-indent', 'unicode-bidi',
+    'vertical-align', 'white-space', 'width'])
+allowed_css_keywords = frozenset(['!important', 'aqua', 'auto', 'black',
+    'block', 'blue', 'bold', 'both', 'bottom', 'brown', 'center', 'collapse',
+    'dashed', 'dotted', 'fuchsia', 'gray', 'green', 'italic', 'left', 'lime',
+    'maroon', 'medium', 'navy', 'none', 'normal', 'nowrap', 'olive',
+    'pointer', 'purple', 'red', 'right', 'silver', 'solid', 'teal', 'top',
+    'transparent', 'underline', 'white', 'yellow'])
+
+# the start of a comment, doctype or processing instruction, which are
+# dropped, or of a tag
+markup_start_re = re.compile(r'<(?:!--|[!?]|(/?)([A-Za-z][A-Za-z0-9]*))')
+# the characters which decide where a tag ends.  A quoted value may hold a >.
+tag_delimiter_re = re.compile('[>"\']')
+tag_rest_re = re.compile(r'''(?:[^>"']|"[^"]*"|'[^']*')*>''')
+attribute_re = re.compile(r'''([^\s"'>/=]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|'''
+        r'''([^\s"'=<>`]+)))?''')
+# an & which doesn't start a character reference
+bare_ampersand_re = re.compile(
+        r'&(?!(?:#[0-9]+|#[xX][0-9a-fA-F]+|[A-Za-z][A-Za-z0-9]*);)')
+# characters browsers ignore in a url's scheme
+url_ignored_re = re.compile('[`\x00-\x20\x7f-\xa0\\s\ufffd]+')
+url_scheme_re = re.compile(r'([a-z0-9][-+.a-z0-9]*):(?:([-\w.+]+/[-\w.+]+)[;,])?')
+css_url_re = re.compile(r'url\s*\(\s*[^\s)]+?\s*\)\s*')
+css_characters_re = re.compile(
+        r'''([:,;#%.\sa-zA-Z0-9!]|\w-\w|'[\s\w]+'|"[\s\w]+"|\([\d,\s]+\))*\Z''')
+css_declarations_re = re.compile(r'\s*([-\w]+\s*:[^:;]*(;\s*|$))*\Z')
+css_declaration_re = re.compile(r'([-\w]+)\s*:\s*([^:;]*)(?:;|$)')
+css_value_re = re.compile(r'(#[0-9a-fA-F]+|rgb\(\d+%?,\d*%?,?\d*%?\)?|'
+        r'\d{0,2}\.?\d{0,2}(cm|em|ex|in|mm|pc|pt|px|%|,|\))?)\Z')
+
+
+def sanitize(string, html5lib=False):
     """
     Ensure that the text does not contain any malicious HTML code which might
     break the page.
+
+    Tags and attributes Textile doesn't produce are taken out, along with
+    urls with other schemes and css which isn't known to be harmless, and
+    tags left open are closed.  It's done in one pass over the markup,
+    without building a tree of it, and takes linear time however the markup
+    is broken.  With html5lib, the text is parsed and serialized again by
+    html5lib's sanitizer instead, which allows far more but is much slower.
     """
-    from html5lib import parseFragment, serialize
+    if html5lib:
+        from html5lib import parseFragment, serialize
+
+        parsed = parseFragment(string)
+        clean = serialize(parsed, sanitize=True, omit_optional_tags=False,
+                          quote_attr_values='always')
+        return clean
+
+    result = []
+    # the tags which have been opened and not closed yet
+    open_tags = []
+    tag_ends = None
+    # only a comment can start after the last >, since nothing else could be
+    # closed
+    last_gt = string.rfind('>')
+    position = 0
+    for m in markup_start_re.finditer(string):
+        start = m.start()
+        if start < position:
+            # it's inside the markup before it
+            continue
+        if m.group() == '<!--':
+            end = string.find('-->', m.end())
+            end = len(string) if end == -1 else end + 3
+        elif m.end() > last_gt:
+            continue
+        elif m.group(2) is None:
+            end = string.find('>', m.end()) + 1
+        else:
+            if tag_ends is None:
+                rest = tag_rest_re.match(string, m.end())
+                end = rest.end() if rest else -1
+                if end == -1:
+                    # there may be many more like it, which would each be
+                    # scanned to the end of the string
+                    tag_ends = _tag_ends(string)
+            else:
+                end = tag_ends(m.end())
+            if end == -1:
+                # the < is left to be escaped along with the text
+                continue
+        if start > position:
+            result.append(_sanitize_text(string[position:start]))
+        position = end
+        closing, tag = m.group(1, 2)
+        if tag is None:
+            continue
+        tag = tag.lower()
+        if tag not in allowed_tags:
+            result.append(encode_html(string[start:end], quotes=False))
+        elif closing:
+            # any tags opened inside this one are closed along with it, and
+            # a tag which isn't open is dropped
+            if tag in open_tags:
+                while True:
+                    last = open_tags.pop()
+                    result.append('</{0}>'.format(last))
+                    if last == tag:
+                        break
+        else:
+            atts = string[m.end():end - 1]
+            result.append('<{0}{1}'.format(tag,
+                _sanitize_attributes(tag, atts) if atts else ''))
+            if tag in html_void_tags:
+                result.append(' />' if atts.rstrip().endswith('/') else '>')
+            else:
+                result.append('>')
+                open_tags.append(tag)
+    if position < len(string):
+        result.append(_sanitize_text(string[position:]))
+    result.extend('</{0}>'.format(tag) for tag in reversed(open_tags))
+    return ''.join(result)
+
+
+def _tag_ends(string):
+    """Return a function giving the index just after the > which closes a
+    tag whose attributes start at the index it's given, or -1 if the tag
+    isn't closed.  Where every quoted value ends is worked out in a single
+    pass, so the tags which are never closed aren't each scanned to the end
+    of the string."""
+    delimiters = [m.start() for m in tag_delimiter_re.finditer(string)]
+    # ends[i] is the end of a tag whose attributes carry on from delimiters[i]
+    ends = [-1] * (len(delimiters) + 1)
+    following = {}
+    for i in range(len(delimiters) - 1, -1, -1):
+        char = string[delimiters[i]]
+        if char == '>':
+            ends[i] = delimiters[i] + 1
+        else:
+            # the value runs to the next of the same quote
+            closing = following.get(char)
+            ends[i] = -1 if closing is None else ends[closing + 1]
+            following[char] = i
+    return lambda index: ends[bisect.bisect_left(delimiters, index)]
+
+
+def _sanitize_text(text):
+    """Escape anything in text which would be taken as markup."""
+    if '&' in text:
+        text = bare_ampersand_re.sub('&amp;', text)
+    return text.replace('<', '&lt;').replace('>', '&gt;')
+
+
+def _sanitize_attributes(tag, atts):
+    """Return the allowed attributes of a tag as a string to follow its name,
+    with the attributes given by the markup atts."""
+    allowed = allowed_tags[tag]
+    seen = set()
+    result = []
+    for m in attribute_re.finditer(atts):
+        name = m.group(1).lower()
+        if name in seen:
+            continue
+        seen.add(name)
+        if name not in global_attributes and name not in allowed:
+            continue
+        value = m.group(2)
+        if value is None:
+            value = m.group(3)
+            if value is None:
+                value = m.group(4) or ''
+        if name in url_attributes or name == 'style':
+            if '&' in value:
+                # imported here to keep import textile fast
+                from html import unescape
+                value = unescape(value)
+            if name == 'style':
+                value = sanitize_css(value)
+            else:
+                scheme = url_scheme_re.match(url_ignored_re.sub('',
+                    value).lower())
+                if scheme and scheme.group(1) not in allowed_url_schemes and \
+                        not (scheme.group(1) == 'data' and
+                             scheme.group(2) in allowed_data_types):
+                    continue
+            value = escape_attribute(value)
+        else:
+            # other values are plain text, so their character references are
+            # left as they are
+            if '&' in value:
+                value = bare_ampersand_re.sub('&amp;', value)
+            value = value.replace('"', '&quot;')
+        result.append(' {0}="{1}"'.format(name, value))
+    return ''.join(result)
+
 
-    parsed = parseFragment(string)
-    clean = serialize(parsed, sanitize=True, omit_optional_tags=False,
-                      quote_attr_values='always')
-    return clean
+def sanitize_css(style):
+    """Return the declarations in the css style which are allowed, or an
+    empty string if there's anything unexpected in it.  Declarations which
+    are kept aren't changed."""
+    # urls aren't allowed
+    style = css_url_re.sub(' ', style)
+    if not (css_characters_re.match(style) and
+            css_declarations_re.match(style)):
+        return ''
+    clean = []
+    kept_all = True
+    for m in css_declaration_re.finditer(style):
+        prop, value = m.group(1).lower(), m.group(2)
+        if not value.strip():
+            kept_all = False
+        elif prop in allowed_css_properties or (
+                prop.split('-')[0] in ('background', 'border', 'margin',
+                    'padding') and
+                all(keyword in allowed_css_keywords or
+                    css_value_re.match(keyword) for keyword in value.split())):
+            clean.append(m.group().strip())
+        else:
+            kept_all = False
+    return style.strip() if kept_all else ' '.join(clean)
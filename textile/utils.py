@@ -5,18 +5,15 @@ try:
 except ImportError:
     import re
 
-from urllib.parse import urlparse
-import html
-
+import functools
 from collections import OrderedDict
 
-from xml.etree import ElementTree
-
-from textile.regex_strings import valign_re_s, halign_re_s
+from textile.regex_strings import halign_re_s
 
 
 def decode_high(text):
     """Decode encoded HTML entities."""
+    import html
     text = '&#{0};'.format(text)
     return html.unescape(text)
 
@@ -26,66 +23,225 @@ def encode_high(text):
 
 def encode_html(text, quotes=True):
     """Return text that's safe for an HTML attribute."""
-    a = (
-        ('&', '&amp;'),
-        ('<', '&lt;'),
-        ('>', '&gt;'))
-
+    # chained str.replace calls are quicker than a single pass with
+    # str.translate or a regex, and they return text itself when there's
+    # nothing to replace.
+    text = text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
     if quotes:
-        a = a + (("'", '&#39;'),
-                 ('"', '&quot;'))
-
-    for k, v in a:
-        text = text.replace(k, v)
+        text = text.replace("'", '&#39;').replace('"', '&quot;')
     return text
 
+def encode_html_many(texts, quotes=True):
+    """Return a list of the texts, each encoded as by encode_html.  They're
+    encoded in one go, which is quicker than encoding them one at a time."""
+    texts = list(texts)
+    if not texts:
+        return []
+    # join them with a character which isn't encoded, and split them up again
+    if any('\0' in text for text in texts):
+        return [encode_html(text, quotes) for text in texts]
+    return encode_html('\0'.join(texts), quotes).split('\0')
+
+# Elements which have no end tag.
+html_void_tags = frozenset(['area', 'base', 'basefont', 'br', 'col', 'embed',
+    'frame', 'hr', 'img', 'input', 'isindex', 'link', 'meta', 'param',
+    'source', 'track', 'wbr'])
+
+def escape_attribute(value):
+    """Escape an attribute value the way ElementTree's html serializer does:
+    ampersands, greater-than signs and double quotes."""
+    if '&' in value:
+        value = value.replace('&', '&amp;')
+    if '>' in value:
+        value = value.replace('>', '&gt;')
+    if '"' in value:
+        value = value.replace('"', '&quot;')
+    return value
+
 def generate_tag(tag, content, attributes=None):
-    """Generate a complete html tag using the ElementTree module.  tag and
-    content are strings, the attributes argument is a dictionary.  As
-    a convenience, if the content is ' /', a self-closing tag is generated."""
-    enc = 'unicode'
+    """Generate a complete html tag.  tag and content are strings, the
+    attributes argument is a dictionary.  As a convenience, if the content is
+    ' /', a self-closing tag is generated.  The output matches ElementTree's
+    html serializer, which was used previously: attributes are sorted by name
+    and void elements get no end tag."""
     if not tag:
         return content
-    element = ElementTree.Element(tag, attrib=attributes)
-    # Sort attributes for Python 3.8+, as suggested in
-    # https://docs.python.org/3/library/xml.etree.elementtree.html
-    if len(element.attrib) > 1:
-        # adjust attribute order, e.g. by sorting
-        attribs = sorted(element.attrib.items())
-        element.attrib.clear()
-        element.attrib.update(attribs)
-    # FIXME: Kind of an ugly hack.  There *must* be a cleaner way.  I tried
-    # adding text by assigning it to element_tag.text.  That results in
-    # non-ascii text being html-entity encoded.  Not bad, but not entirely
-    # matching php-textile either.
-    element_tag = ElementTree.tostringlist(element, encoding=enc,
-            method='html')
-    element_tag.insert(len(element_tag) - 1, content)
-    element_text = ''.join(element_tag)
-    return element_text
+    atts = ''
+    if attributes:
+        items = attributes.items()
+        if len(attributes) > 1:
+            items = sorted(items)
+        atts = ''.join([' {0}="{1}"'.format(k, escape_attribute(v)) for k, v
+            in items])
+    if tag.lower() in html_void_tags:
+        return '<{0}{1}{2}>'.format(tag, atts, content)
+    return '<{0}{1}>{2}</{0}>'.format(tag, atts, content)
+
+# The block tags has_raw_text looks for, by the letter after the '<'.  The
+# pre must come before the p, or a pre would only be matched as a p.
+raw_text_block_tags = {
+    'b': ('blockquote',), 'd': ('div', 'dl'), 'f': ('form',),
+    'h': ('h1', 'h2', 'h3', 'h4', 'h5', 'h6'), 'o': ('ol',),
+    'p': ('pre', 'p'), 't': ('table',), 'u': ('ul',),
+}
+
+raw_text_block_start_re = re.compile(
+    r'<(?=pre|p|blockquote|div|form|table|ul|ol|dl|h[1-6])')
+hr_br_re = re.compile(r'<(hr|br)[^>]*?/>')
 
 def has_raw_text(text):
     """checks whether the text has text not already enclosed by a block tag"""
-    # The php version has orders the below list of tags differently.  The
-    # important thing to note here is that the pre must occur before the p or
-    # else the regex module doesn't properly match pre-s. It only matches the
-    # p in pre.
-    r = re.compile(r'<(pre|p|blockquote|div|form|table|ul|ol|dl|h[1-6])[^>]*?>.*</\1>',
-                   re.S).sub('', text.strip()).strip()
-    r = re.compile(r'<(hr|br)[^>]*?/>').sub('', r)
+    # This is a scan for what the php version removes with the regex
+    # <(pre|p|...)[^>]*?>.*</\1>: from the leftmost opening block tag to the
+    # last closing tag of the same name, again and again.  It goes straight
+    # to the next opening block tag each time, and stops at the first text
+    # which can't be part of a tag.
+    text = text.strip()
+    if not text.startswith('<'):
+        return text != ''
+    # the text left over, and whether it has had a '<' in it yet: before
+    # that, it can't be part of an <hr /> or <br />.
+    left = []
+    opened = False
+    closings = {}
+    gt = 0
+    pos = 0
+    search = raw_text_block_start_re.search
+    m = search(text)
+    while m:
+        start = m.start()
+        end = None
+        for tag in raw_text_block_tags.get(text[start + 1:start + 2], ()):
+            if not text.startswith(tag, start + 1):
+                continue
+            if gt != -1 and gt <= start + len(tag):
+                gt = text.find('>', start + len(tag) + 1)
+            if gt == -1:
+                break
+            if tag not in closings:
+                closings[tag] = text.rfind('</{0}>'.format(tag))
+            if closings[tag] > gt:
+                end = closings[tag] + len(tag) + 3
+                break
+        if end is None:
+            m = search(text, start + 1)
+            continue
+        gap = text[pos:start]
+        if gap:
+            if not opened and gap.split('<', 1)[0].strip():
+                return True
+            opened = opened or '<' in gap
+            left.append(gap)
+        pos = end
+        m = search(text, pos)
+    gap = text[pos:]
+    if not opened and gap.split('<', 1)[0].strip():
+        return True
+    left.append(gap)
+    r = ''.join(left).strip()
+    if '<' in r:
+        r = hr_br_re.sub('', r)
     return '' != r
 
 def is_rel_url(url):
     """Identify relative urls."""
+    from urllib.parse import urlparse
     (scheme, netloc) = urlparse(url)[0:2]
     return not scheme and not netloc
 
 def is_valid_url(url):
+    from urllib.parse import urlparse
     parsed = urlparse(url)
     if parsed.scheme == '':
         return True
     return False
 
+url_tight_re = re.compile(r'(?P<url>^.*\])(?P<tight>\[.*?)$', flags=re.U)
+url_end_re = re.compile(r'(?P<url>^.*\])(?!=)(?P<end>.*?)$', flags=re.U)
+url_closing_tag_re = re.compile(r'(?P<url_chars>.*)(?P<tag><\/[a-z]+)$')
+
+# Textile URLs shouldn't end in these characters, they're popped off the end
+# and pushed out the back of the url again.
+url_end_chars = frozenset('!?:;.,')
+
+def trim_url(url):
+    """Take the characters which don't belong to a link's url off its end.
+    Returns the url, the text popped off its end, any text following a
+    square bracket which is also put back after the link, and whether an
+    unmatched ']' was eaten from the very end of the url."""
+    pop, tight = '', ''
+    eaten = False
+
+    # Look for footnotes or other square-bracket delimited stuff at the end
+    # of the url...
+    #
+    # eg. "text":url][otherstuff... will have "[otherstuff" popped back
+    # out.
+    #
+    # "text":url?q[]=x][123]    will have "[123]" popped off the back, the
+    # remaining closing square brackets will later be tested for balance
+    if ']' in url:
+        m = url_tight_re.search(url)
+        if m:
+            url, tight = m.groups()
+
+        # Split off any trailing text that isn't part of an array assignment.
+        # eg. "text":...?q[]=value1&q[]=value2 ... is ok
+        # "text":...?q[]=value1]following  ... would have "following" popped
+        # back out and the remaining square bracket will later be tested for
+        # balance
+        m = url_end_re.search(url)
+        if m:
+            url = m.group('url')
+            tight = '{0}{1}'.format(m.group('end'), tight)
+
+    # Now parse the url backwards and pop off any chars that don't belong
+    # there (like . or , or unmatched brackets of various kinds).  The url is
+    # kept up to end.
+    end = len(url)
+    kept = ''
+    square_counts = [None, url.count(']')]
+    paren_counts = None
+    while end:
+        c = url[end - 1]
+        if c in url_end_chars:
+            pop = '{0}{1}'.format(c, pop)
+            end = end - 1
+        elif c == '>':
+            # a closing tag is popped off along with it, otherwise the '>' is
+            # dropped, as php-textile does.
+            end = end - 1
+            m = url_closing_tag_re.search(url[:end])
+            if m:
+                pop = '{0}{1}{2}'.format(m.group('tag'), c, pop)
+                end = m.end('url_chars')
+            break
+        elif c == ']':
+            # If we find a closing square bracket we are going to see if it
+            # is balanced.  If it is balanced with matching opening bracket
+            # then it is part of the URL (it has always been added to the
+            # URL a second time) else we spit it back out of the URL.
+            square_counts[0] = square_counts[0] or url.count('[')
+            if square_counts[0] == square_counts[1]:
+                kept = c
+                break
+            # In the case of un-matched closing square brackets we just eat it
+            eaten = eaten or end == len(url)
+            square_counts[1] = square_counts[1] - 1
+            end = end - 1
+        elif c == ')':
+            if paren_counts is None:
+                paren_counts = [url.count('('), url.count(')')]
+            if paren_counts[0] == paren_counts[1]:
+                break
+            # Unbalanced so spit it out the back end
+            pop = '{0}{1}'.format(c, pop)
+            paren_counts[1] = paren_counts[1] - 1
+            end = end - 1
+        else:
+            break
+    return '{0}{1}'.format(url[:end], kept), pop, tight, eaten
+
 def list_type(list_string):
     listtypes = {
         list_string.startswith('*'): 'u',
@@ -102,37 +258,149 @@ def normalize_newlines(string):
     out = re.sub(r'"$', '" ', out)
     return out
 
-def parse_attributes(block_attributes, element=None, include_id=True, restricted=False):
-    vAlign = {'^': 'top', '-': 'middle', '~': 'bottom'}
-    hAlign = {'<': 'left', '=': 'center', '>': 'right', '<>': 'justify'}
-    style = []
-    aclass = ''
-    lang = ''
-    colspan = ''
-    rowspan = ''
-    block_id = ''
-    span = ''
-    width = ''
-    result = OrderedDict()
-
-    if not block_attributes:
-        return result
+def iter_lines(chunks):
+    """Yield the lines of the text read from an iterable of strings, without
+    their line endings.  \r\n and \r are treated as newlines, as in
+    normalize_newlines."""
+    partial = []
+    skip_lf = False
+    for chunk in chunks:
+        # a \r\n may have been split between two chunks.
+        if skip_lf and chunk.startswith('\n'):
+            chunk = chunk[1:]
+        skip_lf = chunk.endswith('\r')
+        chunk = chunk.replace('\r\n', '\n').replace('\r', '\n')
+        if '\n' not in chunk:
+            partial.append(chunk)
+            continue
+        lines = chunk.split('\n')
+        partial.append(lines[0])
+        yield ''.join(partial)
+        for line in lines[1:-1]:
+            yield line
+        partial = [lines[-1]]
+    yield ''.join(partial)
+
+def iter_blocks(chunks):
+    """Read text from an iterable of strings, such as a file object, and yield
+    the same pieces as re.split(r'(\n{2,})', normalize_newlines(text)): the
+    blocks, and the newlines between them.  Only the current block is kept in
+    memory."""
+    blank_re = re.compile(r'[ \t]*$')
+    lines = iter_lines(chunks)
+    # strip leading whitespace
+    for line in lines:
+        line = line.lstrip()
+        if line:
+            break
+    else:
+        return
+
+    block = [line]
+    newlines = 1
+    # lines which are only whitespace are held back until we know they aren't
+    # trailing whitespace at the end of the text.
+    pending = []
+    for line in lines:
+        if not line.strip():
+            pending.append(line)
+            continue
+        pending.append(line)
+        for pending_line in pending:
+            if blank_re.match(pending_line):
+                newlines = newlines + 1
+            elif newlines > 1:
+                yield '\n'.join(block)
+                yield '\n' * newlines
+                block = [pending_line]
+                newlines = 1
+            else:
+                block.append(pending_line)
+        pending = []
+
+    block = '\n'.join(block).rstrip()
+    if block.endswith('"'):
+        block = '{0} '.format(block)
+    yield block
+
+# The parts of an attribute string: a style, a lang, a class with any padding
+# next to it, padding on its own, and anything else.
+attribute_tokens_re = re.compile(r'''
+    (?P<style>\{[^{}]*\})
+    |(?P<lang>\[[^\[\]{}]+\])
+    |(?P<lpad_class>\(*)\((?P<class>[^(){}\[\]]+)\)(?P<rpad_class>\)*)
+    |(?P<lpad>\(+)
+    |(?P<rpad>\)+)
+    |(?P<text>[^(){}\[\]]+)
+    ''', re.X | re.U)
+
+halign_re = re.compile(r'({0})'.format(halign_re_s))
+class_id_re = re.compile(r'^(.*)#(.*)$')
+col_span_re = re.compile(r'(?:\\(\d+)\.?)?\s*(\d+)?')
+
+# The number of distinct attribute strings whose parsed attributes are kept.
+ATTRIBUTES_CACHE_SIZE = 1024
+
+def split_attributes(block_attributes, restricted=False):
+    """Split block_attributes into its style rules, lang, class, left and right
+    padding and the rest of it, in one pass of attribute_tokens_re.
+
+    Returns None when a part could have been made by taking another one out,
+    like the class in '(a[en])' or the padding in '(x(', or it's repeated.
+    Those need split_attributes_stepwise."""
+    parts = {}
+    kinds = []
+    texts = []
+    pos = 0
+    for m in attribute_tokens_re.finditer(block_attributes):
+        if m.start() != pos:
+            return None
+        pos = m.end()
+        kind = m.lastgroup
+        if kind == 'rpad_class':
+            kind = 'class'
+        kinds.append(kind)
+        if kind == 'text':
+            texts.append(m.group(0))
+        elif kind in parts or (kind == 'style' and restricted):
+            return None
+        else:
+            parts[kind] = m
+    if pos != len(block_attributes):
+        return None
+    if 'class' in parts and ('lpad' in parts or 'rpad' in parts):
+        return None
+    # a '(' and a later ')' make a class once anything between them has gone
+    if 'lpad' in parts and 'rpad' in parts:
+        between = kinds[kinds.index('lpad'):kinds.index('rpad')]
+        if 'text' in between:
+            return None
 
+    style = []
+    lang = aclass = ''
+    lpad = rpad = 0
+    if 'style' in parts:
+        style.extend(parts['style'].group(0)[1:-1].rstrip(';').split(';'))
+    if 'lang' in parts:
+        lang = parts['lang'].group(0)[1:-1]
+    if 'class' in parts:
+        m = parts['class']
+        aclass = m.group('class')
+        lpad = len(m.group('lpad_class'))
+        rpad = len(m.group('rpad_class'))
+    if 'lpad' in parts:
+        lpad = len(parts['lpad'].group(0))
+    if 'rpad' in parts:
+        rpad = len(parts['rpad'].group(0))
+    return style, lang, aclass, lpad, rpad, ''.join(texts)
+
+def split_attributes_stepwise(block_attributes, restricted=False):
+    """Split block_attributes as split_attributes does, by finding each part
+    in turn and taking it out before looking for the next."""
+    style = []
+    lang = aclass = ''
+    lpad = rpad = 0
     matched = block_attributes
-    if element == 'td':
-        m = re.search(r'\\(\d+)', matched)
-        if m:
-            colspan = m.group(1)
-
-        m = re.search(r'/(\d+)', matched)
-        if m:
-            rowspan = m.group(1)
-
-    if element == 'td' or element == 'tr':
-        m = re.search(r'(^{0})'.format(valign_re_s), matched)
-        if m:
-            style.append("vertical-align:{0}".format(vAlign[m.group(1)]))
-
     if not restricted:
         m = re.search(r'\{([^}]*)\}', matched)
         if m:
@@ -151,54 +419,108 @@ def parse_attributes(block_attributes, element=None, include_id=True, restricted
 
     m = re.search(r'([(]+)', matched)
     if m:
-        style.append("padding-left:{0}em".format(len(m.group(1))))
+        lpad = len(m.group(1))
         matched = matched.replace(m.group(0), '')
 
     m = re.search(r'([)]+)', matched)
     if m:
-        style.append("padding-right:{0}em".format(len(m.group(1))))
+        rpad = len(m.group(1))
         matched = matched.replace(m.group(0), '')
+    return style, lang, aclass, lpad, rpad, matched
+
+@functools.lru_cache(maxsize=ATTRIBUTES_CACHE_SIZE)
+def parse_attributes_cached(block_attributes, element, include_id, restricted):
+    """Return the attributes parsed from block_attributes as a tuple of (name,
+    value) pairs.  The same few attribute strings turn up again and again,
+    so the results are cached, and they're immutable so they can be shared."""
+    vAlign = {'^': 'top', '-': 'middle', '~': 'bottom'}
+    hAlign = {'<': 'left', '=': 'center', '>': 'right', '<>': 'justify'}
+    style = []
+    colspan = ''
+    rowspan = ''
+    block_id = ''
+    span = ''
+    width = ''
+    result = []
+
+    if element == 'td':
+        if '\\' in block_attributes:
+            m = re.search(r'\\(\d+)', block_attributes)
+            if m:
+                colspan = m.group(1)
+
+        if '/' in block_attributes:
+            m = re.search(r'/(\d+)', block_attributes)
+            if m:
+                rowspan = m.group(1)
 
-    m = re.search(r'({0})'.format(halign_re_s), matched)
+    if element == 'td' or element == 'tr':
+        if block_attributes[0] in vAlign:
+            style.append("vertical-align:{0}".format(
+                vAlign[block_attributes[0]]))
+
+    parts = split_attributes(block_attributes, restricted)
+    if parts is None:
+        parts = split_attributes_stepwise(block_attributes, restricted)
+    rules, lang, aclass, lpad, rpad, matched = parts
+    style.extend(rules)
+    if lpad:
+        style.append("padding-left:{0}em".format(lpad))
+    if rpad:
+        style.append("padding-right:{0}em".format(rpad))
+
+    m = halign_re.search(matched)
     if m:
         style.append("text-align:{0}".format(hAlign[m.group(1)]))
 
-    m = re.search(r'^(.*)#(.*)$', aclass)
-    if m:
-        block_id = m.group(2)
-        aclass = m.group(1)
+    if '#' in aclass:
+        m = class_id_re.search(aclass)
+        if m:
+            block_id = m.group(2)
+            aclass = m.group(1)
 
     if element == 'col':
-        pattern = r'(?:\\(\d+)\.?)?\s*(\d+)?'
-        csp = re.match(pattern, matched)
-        span, width = csp.groups()
+        span, width = col_span_re.match(matched).groups()
 
     if colspan:
-        result['colspan'] = colspan
+        result.append(('colspan', colspan))
 
     if style:
         # Previous splits that created style may have introduced extra
         # whitespace into the list elements.  Clean it up.
         style = [x.strip() for x in style]
-        result['style'] = '{0};'.format("; ".join(style))
+        result.append(('style', '{0};'.format("; ".join(style))))
     if aclass:
-        result['class'] = aclass
+        result.append(('class', aclass))
     if block_id and include_id:
-        result['id'] = block_id
+        result.append(('id', block_id))
     if lang:
-        result['lang'] = lang
+        result.append(('lang', lang))
     if rowspan:
-        result['rowspan'] = rowspan
+        result.append(('rowspan', rowspan))
     if span:
-        result['span'] = span
+        result.append(('span', span))
     if width:
-        result['width'] = width
-    return result
+        result.append(('width', width))
+    return tuple(result)
 
-def pba(block_attributes, element=None, include_id=True, restricted=False):
-    """Parse block attributes."""
-    attrs = parse_attributes(block_attributes, element, include_id, restricted)
+def parse_attributes(block_attributes, element=None, include_id=True, restricted=False):
+    if not block_attributes:
+        return OrderedDict()
+    return OrderedDict(parse_attributes_cached(block_attributes, element,
+        include_id, restricted))
+
+@functools.lru_cache(maxsize=ATTRIBUTES_CACHE_SIZE)
+def pba_cached(block_attributes, element, include_id, restricted):
+    attrs = parse_attributes_cached(block_attributes, element, include_id,
+            restricted)
     if not attrs:
         return ''
-    result = ' '.join(['{0}="{1}"'.format(k, v) for k, v in attrs.items()])
+    result = ' '.join(['{0}="{1}"'.format(k, v) for k, v in attrs])
     return ' {0}'.format(result)
+
+def pba(block_attributes, element=None, include_id=True, restricted=False):
+    """Parse block attributes."""
+    if not block_attributes:
+        return ''
+    return pba_cached(block_attributes, element, include_id, restricted)